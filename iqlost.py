@@ -1,10 +1,20 @@
 import asyncio
+import atexit
+import contextvars
+import hashlib
+import heapq
 import logging
 import os
+import queue
 import random
+import sys
 import time
-from html import unescape
-from typing import Set
+import zlib
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from html import escape, unescape
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional, Set, Tuple
 import asyncpg
 import json
 from datetime import datetime
@@ -12,108 +22,110 @@ from datetime import datetime
 import aiohttp
 from dotenv import load_dotenv
 
-from aiogram import Bot, Dispatcher, types, F
+from aiogram import BaseMiddleware, Bot, Dispatcher, types, F
 
-# ─── Imports for Dummy HTTP Server ──────────────────────────────────────────
-import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from aiohttp import web
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
 from aiogram.enums import ChatAction, ParseMode
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
 from aiogram.filters import Command
 from aiogram.types import BotCommand, Message, Update, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # text | json
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))  # Share of per-update info logs that are kept
 
 class ColoredFormatter(logging.Formatter):
     """Custom formatter with colors and emojis for better readability"""
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Check if we should use colors
-        import os
-        import sys
         self.use_colors = (
             hasattr(sys.stderr, "isatty") and sys.stderr.isatty() or
             os.environ.get('FORCE_COLOR') == '1' or
             os.environ.get('TERM', '').lower() in ('xterm', 'xterm-color', 'xterm-256color', 'screen', 'screen-256color')
         )
     
-    COLORS = {
-        'DEBUG': '\x1b[36m',    # Cyan
-        'INFO': '\x1b[32m',     # Green  
-        'WARNING': '\x1b[33m',  # Yellow
-        'ERROR': '\x1b[31m',    # Red
-        'CRITICAL': '\x1b[35m', # Magenta
-        'RESET': '\x1b[0m',     # Reset
-        'BLUE': '\x1b[34m',     # Blue
-        'PURPLE': '\x1b[35m',   # Purple
-        'CYAN': '\x1b[36m',     # Cyan
-        'YELLOW': '\x1b[33m',   # Yellow
-        'GREEN': '\x1b[32m',    # Green
-        'RED': '\x1b[31m',      # Red (alias for ERROR)
-        'BOLD': '\x1b[1m',      # Bold
-        'DIM': '\x1b[2m'        # Dim
+    RESET = '\x1b[0m'
+    LEVEL_COLORS = {
+        logging.DEBUG: '\x1b[36m',                # Cyan
+        logging.INFO: '\x1b[32m',                 # Green
+        logging.WARNING: '\x1b[33m',              # Yellow
+        logging.ERROR: '\x1b[31m\x1b[1m',         # Bold red
+        logging.CRITICAL: '\x1b[31m\x1b[1m',      # Bold red
     }
     
     def format(self, record):
-        if not self.use_colors:
-            return super().format(record)
-            
-        # Create a copy to avoid modifying the original
-        formatted_record = logging.makeLogRecord(record.__dict__)
-        
-        # Get the basic formatted message
-        message = super().format(formatted_record)
-        
-        # Apply colors to the entire message
-        return self.colorize_full_message(message, record.levelname)
-    
-    def colorize_full_message(self, message, level):
-        """Apply colors to the entire formatted message"""
+        message = super().format(record)
         if not self.use_colors:
             return message
-            
-        # Color based on log level
-        level_color = self.COLORS.get(level, self.COLORS['RESET'])
-        
-        # Apply level-based coloring to the entire message
-        if level == 'ERROR' or level == 'CRITICAL':
-            return f"{self.COLORS['ERROR']}{self.COLORS['BOLD']}{message}{self.COLORS['RESET']}"
-        elif level == 'WARNING':
-            return f"{self.COLORS['YELLOW']}{message}{self.COLORS['RESET']}"
-        elif level == 'INFO':
-            # For INFO messages, use subtle coloring
-            if any(word in message for word in ['Bot', 'Quiz', 'startup', 'connected', 'Success']):
-                return f"{self.COLORS['GREEN']}{message}{self.COLORS['RESET']}"
-            elif any(word in message for word in ['API', 'HTTP', 'Fetching']):
-                return f"{self.COLORS['BLUE']}{message}{self.COLORS['RESET']}"
-            elif any(word in message for word in ['User', 'extracted']):
-                return f"{self.COLORS['CYAN']}{message}{self.COLORS['RESET']}"
-            else:
-                return f"{self.COLORS['GREEN']}{message}{self.COLORS['RESET']}"
-        else:
-            return f"{level_color}{message}{self.COLORS['RESET']}"
+        return f"{self.LEVEL_COLORS.get(record.levelno, self.RESET)}{message}{self.RESET}"
+
+class JsonFormatter(logging.Formatter):
+    """Compact one-line JSON records for log collectors"""
+    
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class SampleFilter(logging.Filter):
+    """Keep a random share of INFO-and-below records; warnings and errors always pass"""
+    
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+class LocalQueueHandler(QueueHandler):
+    """Queue records as they are; the listener thread formats them"""
+    
+    def prepare(self, record):
+        # Records never leave the process, so message formatting is deferred to the listener
+        return record
 
 # Force color support in terminal
 os.environ['FORCE_COLOR'] = '1'
 os.environ['TERM'] = 'xterm-256color'
 
-# Setup colored logging
+# Setup logging: the event loop only enqueues records, a listener thread formats and writes them
 logger = logging.getLogger("quizbot")
-logger.setLevel(logging.INFO)
+logger.setLevel(LOG_LEVEL)
 
 # Remove any existing handlers
 for handler in logger.handlers[:]:
     logger.removeHandler(handler)
 
-# Create and configure console handler with colors
 console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(ColoredFormatter("%(asctime)s | %(levelname)s | %(message)s"))
+if LOG_FORMAT == "json":
+    console_handler.setFormatter(JsonFormatter())
+else:
+    console_handler.setFormatter(ColoredFormatter("%(asctime)s | %(levelname)s | %(message)s"))
 
-# Add handler to logger
-logger.addHandler(console_handler)
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, console_handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+logger.addHandler(LocalQueueHandler(log_queue))
 
 # Prevent propagation to root logger to avoid duplicate messages
 logger.propagate = False
 
+# Per-update progress logs go through a sampled child logger
+update_logger = logger.getChild("updates")
+update_logger.addFilter(SampleFilter(LOG_SAMPLE_RATE))
+
 def extract_user_info(msg: Message):
     """Extract user and chat information from message"""
     logger.debug("🔍 Extracting user information from message")
@@ -129,9 +141,9 @@ def extract_user_info(msg: Message):
         "chat_username": f"@{c.username}" if c.username else "No Username",
         "chat_link": f"https://t.me/{c.username}" if c.username else "No Link",
     }
-    logger.info(
-        f"📑 User info extracted: {info['full_name']} (@{info['username']}) "
-        f"[ID: {info['user_id']}] in {info['chat_title']} [{info['chat_id']}] {info['chat_link']}"
+    update_logger.info(
+        "📑 User info extracted: %s (@%s) [ID: %s] in %s [%s] %s",
+        info['full_name'], info['username'], info['user_id'], info['chat_title'], info['chat_id'], info['chat_link']
     )
     return info
 
@@ -142,9 +154,23 @@ TOKEN = os.getenv("BOT_TOKEN")
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 OWNER_ID = 5290407067  # Hardcoded owner ID
 
+# Run mode: "webhook" serves updates from the aiohttp app, "polling" is the fallback,
+# "supervisor" fronts the webhook for WORKER_COUNT "worker" processes
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")  # Public base URL, e.g. https://iqlost.onrender.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("PORT", "10000"))  # Render injects this
+WORKER_COUNT = int(os.getenv("WORKER_COUNT", str(os.cpu_count() or 2)))
+WORKER_BASE_PORT = int(os.getenv("WORKER_BASE_PORT", str(WEB_PORT + 1)))  # Workers listen on consecutive local ports
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+WORKER_UPDATE_PATH = "/worker/update"
+
 logger.info(f"🔑 Bot token loaded: {'✅ Success' if TOKEN else '❌ Missing'}")
 logger.info(f"🗄️ Database URL loaded: {'✅ Success' if DATABASE_URL else '❌ Missing'}")
 logger.info(f"👑 Owner ID configured: {OWNER_ID}")
+logger.info(f"📡 Bot mode: {BOT_MODE}")
 
 if not TOKEN:
     logger.error("❌ BOT_TOKEN environment variable missing - cannot start bot")
@@ -154,6 +180,17 @@ if not DATABASE_URL:
     logger.error("❌ DATABASE_URL environment variable missing - cannot start bot")
     raise ValueError("DATABASE_URL is required")
 
+if BOT_MODE not in ("polling", "webhook", "supervisor", "worker"):
+    logger.error(f"❌ Unknown BOT_MODE {BOT_MODE!r} - use 'polling', 'webhook', 'supervisor' or 'worker'")
+    raise ValueError("BOT_MODE must be 'polling', 'webhook', 'supervisor' or 'worker'")
+
+if BOT_MODE in ("webhook", "supervisor") and not WEBHOOK_URL:
+    logger.error(f"❌ WEBHOOK_URL environment variable missing - required in {BOT_MODE} mode")
+    raise ValueError(f"WEBHOOK_URL is required in {BOT_MODE} mode")
+
+if BOT_MODE == "supervisor" and WORKER_COUNT < 1:
+    raise ValueError("WORKER_COUNT must be at least 1")
+
 logger.info("🤖 Initializing bot and dispatcher with HTML parse mode")
 bot = Bot(
     token=TOKEN,
@@ -162,8 +199,238 @@ bot = Bot(
 dp = Dispatcher()
 logger.info("✅ Bot and dispatcher initialized successfully")
 
+# ─── Metrics ────────────────────────────────────────────────────────────────
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+def format_labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Monotonic Prometheus counter with optional labels"""
+    
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: Dict[tuple, float] = {}
+    
+    def inc(self, *label_values, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_values, value in self.values.items():
+            lines.append(f"{self.name}{format_labels(self.labels, label_values)} {value}")
+        return lines
+
+class Histogram:
+    """Prometheus histogram with fixed buckets and optional labels"""
+    
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.series: Dict[tuple, list] = {}  # label values -> [bucket counts..., sum, count]
+    
+    def observe(self, value: float, *label_values):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_values, series in self.series.items():
+            for bound, count in zip(self.buckets, series):
+                labels = format_labels(self.labels, label_values, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = format_labels(self.labels, label_values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, label_values)} {series[-2]}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, label_values)} {series[-1]}")
+        return lines
+
+class Gauge:
+    """Gauge read from a callback at scrape time; the callback returns a number or {label values: number}"""
+    
+    def __init__(self, name: str, help_text: str, read, labels: Tuple[str, ...] = (), kind: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.read = read
+        self.labels = labels
+        self.kind = kind
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.read()
+        except Exception as e:
+            logger.debug(f"Gauge {self.name} unavailable: {str(e)}")
+            return lines
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            if not isinstance(label_values, tuple):
+                label_values = (label_values,)
+            lines.append(f"{self.name}{format_labels(self.labels, label_values)} {value}")
+        return lines
+
+quiz_fetch_seconds = Histogram("iqlost_quiz_fetch_seconds", "Time to get a quiz question by source", ("source",))
+opentdb_request_seconds = Histogram("iqlost_opentdb_request_seconds", "OpenTDB HTTP request latency by outcome", ("outcome",))
+opentdb_retries_total = Counter("iqlost_opentdb_retries_total", "OpenTDB request retries")
+db_statement_seconds = Histogram("iqlost_db_statement_seconds", "Database statement latency", ("statement",))
+telegram_request_seconds = Histogram("iqlost_telegram_request_seconds", "Telegram Bot API call latency", ("method",))
+telegram_errors_total = Counter("iqlost_telegram_errors_total", "Failed Telegram Bot API calls", ("method", "error"))
+update_seconds = Histogram("iqlost_update_seconds", "Update processing latency by update type", ("type",))
+handler_seconds = Histogram("iqlost_handler_seconds", "Handler latency", ("handler",))
+
+async def timed_query(statement: str, awaitable):
+    """Await a database call and record its latency under `statement`"""
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        db_statement_seconds.observe(time.perf_counter() - started, statement)
+
+def db_pool_usage() -> dict:
+    if not db_pool:
+        return {}
+    size, idle = db_pool.get_size(), db_pool.get_idle_size()
+    return {("in_use",): size - idle, ("idle",): idle, ("max",): db_pool.get_max_size()}
+
+def collect_metrics() -> List:
+    """Every metric exposed on /metrics, including gauges read at scrape time"""
+    return [
+        quiz_fetch_seconds, opentdb_request_seconds, opentdb_retries_total, db_statement_seconds,
+        telegram_request_seconds, telegram_errors_total, update_seconds, handler_seconds, db_pool_wait_seconds,
+        Gauge("iqlost_active_polls", "Polls held in the in-memory registry", lambda: len(poll_registry)),
+        Gauge("iqlost_db_pool_connections", "Database pool connections by state", db_pool_usage, ("state",)),
+        Gauge("iqlost_queue_depth", "Items waiting in background queues", lambda: {
+            "answers": answer_writer.queue_depth,
+            "polls": poll_writer.queue_depth,
+            "profiles": user_profile_writer.queue_depth + group_profile_writer.queue_depth,
+            "schedules": schedule_writer.queue_depth,
+            "audits": audit_queue.qsize(),
+            "outbound": outbound_scheduler.queue_depth,
+            "opentdb": opentdb_limiter.queue_depth,
+        }, ("queue",)),
+        Gauge("iqlost_question_pool_size", "Prefetched questions per category",
+              lambda: {str(cat_id): len(pool) for cat_id, pool in question_pools.items()}, ("category",)),
+        Gauge("iqlost_outbound_retries_total", "Telegram sends retried after retry_after",
+              lambda: outbound_scheduler.retries, kind="counter"),
+        Gauge("iqlost_answer_audits_total", "Answer audit results", lambda: dict(audit_counters), ("result",),
+              kind="counter"),
+        Gauge("iqlost_profile_writes_skipped_total", "Profile upserts skipped by the profile cache",
+              lambda: {"user": user_profiles.skipped, "group": group_profiles.skipped}, ("kind",), kind="counter"),
+        Gauge("iqlost_throttled_total", "Quiz requests dropped by the throttle", lambda: dict(quiz_throttle.throttled),
+              ("scope",), kind="counter"),
+        Gauge("iqlost_throttle_buckets", "Throttle buckets held in memory",
+              lambda: {"user": len(quiz_throttle.users), "chat": len(quiz_throttle.chats)}, ("store",)),
+        Gauge("iqlost_auto_quiz_groups", "Groups with auto-quiz enabled", lambda: len(auto_quiz_active_groups)),
+        Gauge("iqlost_leader", "1 when this instance holds the leader lock", lambda: int(leader_election.is_leader)),
+        Gauge("iqlost_broadcast_jobs_running", "Broadcast jobs being sent", lambda: len(broadcast_engine.tasks)),
+    ]
+
+def render_metrics() -> str:
+    lines = []
+    for metric in collect_metrics():
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+async def update_metrics_middleware(handler, event, data):
+    """Outer update middleware timing the whole processing of an update"""
+    started = time.perf_counter()
+    try:
+        return await handler(event, data)
+    finally:
+        update_seconds.observe(time.perf_counter() - started, getattr(event, "event_type", "unknown"))
+
+async def handler_metrics_middleware(handler, event, data):
+    """Inner middleware timing the handler that matched an event"""
+    started = time.perf_counter()
+    try:
+        return await handler(event, data)
+    finally:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        handler_seconds.observe(time.perf_counter() - started, name)
+
+dp.update.outer_middleware(update_metrics_middleware)
+for observer in (dp.message, dp.callback_query, dp.poll, dp.poll_answer):
+    observer.middleware(handler_metrics_middleware)
+
+class TelegramCallMetrics(BaseRequestMiddleware):
+    """Request middleware recording Bot API latency and errors per method"""
+    
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method):
+        api_method = getattr(method, "__api_method__", type(method).__name__)
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            telegram_errors_total.inc(api_method, type(e).__name__)
+            raise
+        finally:
+            telegram_request_seconds.observe(time.perf_counter() - started, api_method)
+
 # Database connection pool
 db_pool = None
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "10"))  # Seconds before a statement is cancelled
+DB_BULK_TIMEOUT = float(os.getenv("DB_BULK_TIMEOUT", "600"))  # Seconds allowed for bulk copies such as broadcast snapshots
+SCHEMA_LOCK_KEY = int(os.getenv("SCHEMA_LOCK_KEY", "7305746212381923584"))  # Serializes schema setup across processes
+DB_MAX_INACTIVE_LIFETIME = float(os.getenv("DB_MAX_INACTIVE_LIFETIME", "300"))  # Seconds an idle connection is kept
+
+db_pool_wait_seconds = Histogram("iqlost_db_pool_wait_seconds", "Time spent waiting for a pooled connection")
+
+class QuizConnection(asyncpg.Connection):
+    """Connection that keeps the hot statements prepared"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hot_statements: dict = {}  # name -> PreparedStatement
+
+async def init_db_connection(connection: QuizConnection):
+    """Prepare hot statements on every new pooled connection"""
+    for name, sql in HOT_STATEMENTS.items():
+        try:
+            connection.hot_statements[name] = await connection.prepare(sql)
+        except asyncpg.UndefinedTableError:
+            # Fresh database: tables are created after the pool, connections are recycled afterwards
+            pass
+
+async def hot_query(connection, name: str, method: str, *args):
+    """Run a hot statement with its prepared plan, or as plain SQL if it is not prepared"""
+    statement = connection.hot_statements.get(name)
+    if statement is None:
+        return await getattr(connection, method)(HOT_STATEMENTS[name], *args)
+    return await getattr(statement, method)(*args)
+
+@asynccontextmanager
+async def db_acquire():
+    """Acquire a pooled connection, recording how long we waited for it"""
+    started = time.perf_counter()
+    async with db_pool.acquire() as connection:
+        db_pool_wait_seconds.observe(time.perf_counter() - started)
+        yield connection
+
+@asynccontextmanager
+async def db_schema_connection():
+    """Open a standalone connection without the pool's command timeout, for DDL and migrations"""
+    connection = await asyncpg.connect(DATABASE_URL)
+    try:
+        yield connection
+    finally:
+        await connection.close()
 
 # Database functions
 async def init_database():
@@ -172,10 +439,22 @@ async def init_database():
     logger.info("🗄️ Initializing database connection...")
     
     try:
-        db_pool = await asyncpg.create_pool(DATABASE_URL)
-        logger.info("✅ Database connection pool created successfully")
+        db_pool = await asyncpg.create_pool(
+            DATABASE_URL,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            command_timeout=DB_COMMAND_TIMEOUT,
+            max_inactive_connection_lifetime=DB_MAX_INACTIVE_LIFETIME,
+            connection_class=QuizConnection,
+            init=init_db_connection,
+        )
+        logger.info(f"✅ Database connection pool created successfully ({DB_POOL_MIN_SIZE}-{DB_POOL_MAX_SIZE} connections)")
         
-        async with db_pool.acquire() as connection:
+        # Migrations, backfills and index builds can outlast DB_COMMAND_TIMEOUT, so they run unbounded
+        async with db_schema_connection() as connection, connection.transaction():
+            # Workers start together; the first one sets up the schema while the rest wait
+            await connection.execute("SELECT pg_advisory_xact_lock($1)", SCHEMA_LOCK_KEY)
+            
             # Create users table
             await connection.execute('''
                 CREATE TABLE IF NOT EXISTS users (
@@ -202,56 +481,332 @@ async def init_database():
                 )
             ''')
             
-            # Create quiz_stats table for tracking individual quiz attempts
+            # Per-group auto-quiz settings and schedule
+            await connection.execute('''
+                ALTER TABLE groups
+                    ADD COLUMN IF NOT EXISTS auto_quiz_interval INTEGER,
+                    ADD COLUMN IF NOT EXISTS auto_quiz_categories TEXT,
+                    ADD COLUMN IF NOT EXISTS next_quiz_at TIMESTAMP,
+                    ADD COLUMN IF NOT EXISTS auto_quiz_disabled_at TIMESTAMP
+            ''')
+            
+            # Create quiz_stats as a monthly partitioned table for tracking individual quiz attempts
+            await setup_quiz_stats(connection)
+            
+            # Create questions table as a local question bank
+            await connection.execute('''
+                CREATE TABLE IF NOT EXISTS questions (
+                    question_hash CHAR(40) PRIMARY KEY,
+                    category_id INTEGER NOT NULL,
+                    question TEXT NOT NULL,
+                    correct_answer TEXT NOT NULL,
+                    incorrect_answers TEXT[] NOT NULL,
+                    rand_key DOUBLE PRECISION NOT NULL DEFAULT random(),
+                    added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Index for random selection of questions per category
+            await connection.execute('''
+                CREATE INDEX IF NOT EXISTS idx_questions_category_rand
+                ON questions (category_id, rand_key)
+            ''')
+            
+            # Create active_polls table so answers can be attributed across restarts and processes
             await connection.execute('''
-                CREATE TABLE IF NOT EXISTS quiz_stats (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT REFERENCES users(user_id),
+                CREATE TABLE IF NOT EXISTS active_polls (
+                    poll_id VARCHAR(64) PRIMARY KEY,
+                    chat_id BIGINT NOT NULL,
+                    message_id BIGINT,
                     group_id BIGINT,
+                    user_id BIGINT,
                     category VARCHAR(50),
-                    question TEXT,
-                    user_answer VARCHAR(255),
-                    correct_answer VARCHAR(255),
-                    is_correct BOOLEAN,
-                    answered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    question TEXT NOT NULL,
+                    options TEXT[] NOT NULL,
+                    correct_index SMALLINT NOT NULL,
+                    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Index for expiring old polls
+            await connection.execute('''
+                CREATE INDEX IF NOT EXISTS idx_active_polls_created
+                ON active_polls (created_at)
+            ''')
+            
+            # Create per-group player aggregates, backfilled from quiz_stats on first creation
+            group_stats_exists = await connection.fetchval("SELECT to_regclass('group_user_stats') IS NOT NULL")
+            await connection.execute('''
+                CREATE TABLE IF NOT EXISTS group_user_stats (
+                    group_id BIGINT NOT NULL,
+                    user_id BIGINT NOT NULL,
+                    correct_answers INTEGER DEFAULT 0,
+                    wrong_answers INTEGER DEFAULT 0,
+                    total_quizzes INTEGER DEFAULT 0,
+                    last_answered TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (group_id, user_id)
+                )
+            ''')
+            
+            # Index for top-N players per group
+            await connection.execute('''
+                CREATE INDEX IF NOT EXISTS idx_group_user_stats_top
+                ON group_user_stats (group_id, correct_answers DESC, total_quizzes DESC)
+            ''')
+            
+            if not group_stats_exists:
+                await connection.execute('''
+                    INSERT INTO group_user_stats
+                        (group_id, user_id, correct_answers, wrong_answers, total_quizzes, last_answered)
+                    SELECT group_id, user_id,
+                           COUNT(*) FILTER (WHERE is_correct),
+                           COUNT(*) FILTER (WHERE NOT is_correct),
+                           COUNT(*),
+                           MAX(answered_at)
+                    FROM quiz_stats
+                    WHERE group_id IS NOT NULL AND user_id IS NOT NULL
+                    GROUP BY group_id, user_id
+                    ON CONFLICT (group_id, user_id) DO NOTHING
+                ''')
+                logger.info("📊 Backfilled group_user_stats from quiz_stats")
+            
+            # Create broadcast jobs with per-target delivery status so broadcasts survive restarts
+            await connection.execute('''
+                CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                    job_id SERIAL PRIMARY KEY,
+                    owner_id BIGINT NOT NULL,
+                    target_type VARCHAR(16) NOT NULL,
+                    from_chat_id BIGINT NOT NULL,
+                    message_id BIGINT NOT NULL,
+                    forward BOOLEAN NOT NULL DEFAULT FALSE,
+                    status VARCHAR(16) NOT NULL DEFAULT 'running',
+                    total INTEGER NOT NULL DEFAULT 0,
+                    sent INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    progress_chat_id BIGINT,
+                    progress_message_id BIGINT,
+                    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP
+                )
+            ''')
+            
+            await connection.execute('''
+                CREATE TABLE IF NOT EXISTS broadcast_targets (
+                    job_id INTEGER NOT NULL REFERENCES broadcast_jobs(job_id) ON DELETE CASCADE,
+                    target_id BIGINT NOT NULL,
+                    status VARCHAR(8) NOT NULL DEFAULT 'pending',
+                    error TEXT,
+                    PRIMARY KEY (job_id, target_id)
                 )
             ''')
             
+            # Index for fetching the remaining targets of a job
+            await connection.execute('''
+                CREATE INDEX IF NOT EXISTS idx_broadcast_targets_pending
+                ON broadcast_targets (job_id, target_id) WHERE status = 'pending'
+            ''')
+            
         logger.info("✅ Database tables created/verified successfully")
         
+        # Re-run the init hook so statements skipped on a fresh database get prepared
+        await db_pool.expire_connections()
+        
     except Exception as e:
         logger.error(f"❌ Database initialization failed: {str(e)}")
         raise
 
+# ─── quiz_stats Partitioning ────────────────────────────────────────────────
+QUIZ_STATS_MONTHS_AHEAD = int(os.getenv("QUIZ_STATS_MONTHS_AHEAD", "2"))
+QUIZ_STATS_RETENTION_MONTHS = int(os.getenv("QUIZ_STATS_RETENTION_MONTHS", "0"))  # 0 keeps every month
+QUIZ_STATS_MAINTENANCE_SECONDS = 6 * 3600
+
+QUIZ_STATS_PARTITIONED_DDL = '''
+    CREATE TABLE IF NOT EXISTS quiz_stats (
+        id BIGSERIAL,
+        user_id BIGINT REFERENCES users(user_id),
+        group_id BIGINT,
+        category VARCHAR(50),
+        question TEXT,
+        user_answer VARCHAR(255),
+        correct_answer VARCHAR(255),
+        is_correct BOOLEAN,
+        answered_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, answered_at)
+    ) PARTITION BY RANGE (answered_at)
+'''
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Return the first day of the month `months` away from `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def quiz_stats_partition_name(month: datetime) -> str:
+    return f"quiz_stats_{month.year:04d}_{month.month:02d}"
+
+async def setup_quiz_stats(connection):
+    """Create quiz_stats partitioned by month, migrating a plain legacy table once"""
+    relkind = await connection.fetchval(
+        "SELECT relkind::text FROM pg_class WHERE oid = to_regclass('quiz_stats')"
+    )
+    current_month = add_months(datetime.now(), 0)
+    
+    if relkind == 'r':
+        logger.info("🔀 Migrating quiz_stats to a monthly partitioned table")
+        async with connection.transaction():
+            await connection.execute('''
+                ALTER TABLE quiz_stats RENAME TO quiz_stats_legacy;
+                ALTER TABLE quiz_stats_legacy RENAME CONSTRAINT quiz_stats_pkey TO quiz_stats_legacy_pkey;
+                ALTER SEQUENCE IF EXISTS quiz_stats_id_seq RENAME TO quiz_stats_legacy_id_seq;
+            ''')
+            await connection.execute(QUIZ_STATS_PARTITIONED_DDL)
+            
+            oldest = await connection.fetchval("SELECT MIN(answered_at) FROM quiz_stats_legacy")
+            start_month = add_months(oldest, 0) if oldest else current_month
+            await ensure_quiz_stats_partitions(connection, start_month)
+            
+            await connection.execute('''
+                INSERT INTO quiz_stats
+                    (id, user_id, group_id, category, question, user_answer, correct_answer, is_correct, answered_at)
+                SELECT id, user_id, group_id, category, question, user_answer, correct_answer, is_correct,
+                       COALESCE(answered_at, CURRENT_TIMESTAMP)
+                FROM quiz_stats_legacy
+            ''')
+            await connection.execute('''
+                SELECT setval(pg_get_serial_sequence('quiz_stats', 'id'), COALESCE(MAX(id), 0) + 1, false)
+                FROM quiz_stats
+            ''')
+            await connection.execute("DROP TABLE quiz_stats_legacy")
+        logger.info("✅ quiz_stats migrated to monthly partitions")
+    else:
+        await connection.execute(QUIZ_STATS_PARTITIONED_DDL)
+        await ensure_quiz_stats_partitions(connection, current_month)
+    
+    # Secondary indexes, created on every partition by the parent
+    await connection.execute('''
+        CREATE INDEX IF NOT EXISTS idx_quiz_stats_user_answered
+        ON quiz_stats (user_id, answered_at)
+    ''')
+    await connection.execute('''
+        CREATE INDEX IF NOT EXISTS idx_quiz_stats_group_answered
+        ON quiz_stats (group_id, answered_at)
+    ''')
+
+async def ensure_quiz_stats_partitions(connection, start_month: datetime):
+    """Create monthly partitions from `start_month` up to QUIZ_STATS_MONTHS_AHEAD months ahead"""
+    last_month = add_months(datetime.now(), QUIZ_STATS_MONTHS_AHEAD)
+    month = start_month
+    while month <= last_month:
+        await create_quiz_stats_partition(connection, month)
+        month = add_months(month, 1)
+    
+    # Catch-all for rows outside the managed months
+    await connection.execute("CREATE TABLE IF NOT EXISTS quiz_stats_default PARTITION OF quiz_stats DEFAULT")
+
+async def create_quiz_stats_partition(connection, month: datetime):
+    """Create the partition of `month`, moving rows that landed in the default partition into it"""
+    name = quiz_stats_partition_name(month)
+    if await connection.fetchval("SELECT to_regclass($1) IS NOT NULL", name):
+        return
+    
+    next_month = add_months(month, 1)
+    create_sql = (f"CREATE TABLE {name} PARTITION OF quiz_stats "
+                  f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')")
+    has_default = await connection.fetchval("SELECT to_regclass('quiz_stats_default') IS NOT NULL")
+    stray = has_default and await connection.fetchval('''
+        SELECT EXISTS (SELECT 1 FROM quiz_stats_default WHERE answered_at >= $1 AND answered_at < $2)
+    ''', month, next_month)
+    if not stray:
+        await connection.execute(create_sql)
+        return
+    
+    # Postgres refuses a partition whose range still has rows in the default partition
+    async with connection.transaction():
+        await connection.execute("ALTER TABLE quiz_stats DETACH PARTITION quiz_stats_default")
+        await connection.execute(create_sql)
+        moved = await connection.execute(f'''
+            WITH moved AS (
+                DELETE FROM quiz_stats_default WHERE answered_at >= $1 AND answered_at < $2
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+        ''', month, next_month)
+        await connection.execute("ALTER TABLE quiz_stats ATTACH PARTITION quiz_stats_default DEFAULT")
+    logger.info(f"🔀 Created quiz_stats partition {name}, moved rows out of the default partition ({moved})")
+
+async def drop_expired_quiz_stats_partitions(connection):
+    """Detach and drop monthly partitions older than QUIZ_STATS_RETENTION_MONTHS"""
+    if QUIZ_STATS_RETENTION_MONTHS <= 0:
+        return
+    
+    oldest_kept = quiz_stats_partition_name(add_months(datetime.now(), -QUIZ_STATS_RETENTION_MONTHS))
+    rows = await connection.fetch('''
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'quiz_stats'::regclass
+    ''')
+    for row in rows:
+        name = row['relname']
+        # Zero-padded names sort chronologically
+        if name != "quiz_stats_default" and name < oldest_kept:
+            await connection.execute(f"ALTER TABLE quiz_stats DETACH PARTITION {name}")
+            await connection.execute(f"DROP TABLE {name}")
+            logger.info(f"🗑️ Dropped expired quiz_stats partition {name}")
+
+async def quiz_stats_maintenance_loop():
+    """Keep future quiz_stats partitions created and expired ones dropped"""
+    while True:
+        await asyncio.sleep(QUIZ_STATS_MAINTENANCE_SECONDS)
+        try:
+            async with db_schema_connection() as connection, connection.transaction():
+                await connection.execute("SELECT pg_advisory_xact_lock($1)", SCHEMA_LOCK_KEY)
+                await ensure_quiz_stats_partitions(connection, add_months(datetime.now(), 0))
+                await drop_expired_quiz_stats_partitions(connection)
+        except Exception as e:
+            logger.error(f"❌ quiz_stats partition maintenance failed: {str(e)}")
+
+SAVE_USER_SQL = '''
+    INSERT INTO users (user_id, username, full_name, last_active)
+    VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
+    ON CONFLICT (user_id) 
+    DO UPDATE SET 
+        username = $2,
+        full_name = $3,
+        last_active = CURRENT_TIMESTAMP
+    RETURNING (xmax = 0)
+'''
+
 async def save_user(user_id: int, username: str, full_name: str):
-    """Save or update user in database"""
-    if not db_pool:
+    """Save or update user in database, skipping writes the profile cache says are redundant"""
+    if not db_pool or not user_profiles.touch(user_id, (username, full_name)):
+        return
+    
+    if profile_writers_running():
+        user_profile_writer.add((user_id, username, full_name, datetime.now()))
         return
         
     try:
-        async with db_pool.acquire() as connection:
-            await connection.execute('''
-                INSERT INTO users (user_id, username, full_name, last_active)
-                VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
-                ON CONFLICT (user_id) 
-                DO UPDATE SET 
-                    username = $2,
-                    full_name = $3,
-                    last_active = CURRENT_TIMESTAMP
-            ''', user_id, username, full_name)
+        async with db_acquire() as connection:
+            inserted = await timed_query("save_user", hot_query(connection, "save_user", "fetchval",
+                                                                user_id, username, full_name))
             
+        leaderboard.observe_profile(user_id, full_name, created=inserted)
         logger.debug(f"💾 User saved to database: {full_name} (ID: {user_id})")
         
     except Exception as e:
+        user_profiles.forget(user_id)
         logger.error(f"❌ Failed to save user {user_id}: {str(e)}")
 
 async def save_group(group_id: int, group_title: str, group_username: str):
-    """Save or update group in database"""
-    if not db_pool:
+    """Save or update group in database, skipping writes the profile cache says are redundant"""
+    if not db_pool or not group_profiles.touch(group_id, (group_title, group_username)):
+        return
+    
+    if profile_writers_running():
+        group_profile_writer.add((group_id, group_title, group_username, datetime.now()))
         return
         
     try:
-        async with db_pool.acquire() as connection:
+        async with db_acquire() as connection:
             await connection.execute('''
                 INSERT INTO groups (group_id, group_title, group_username, last_active)
                 VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
@@ -265,85 +820,412 @@ async def save_group(group_id: int, group_title: str, group_username: str):
         logger.debug(f"💾 Group saved to database: {group_title} (ID: {group_id})")
         
     except Exception as e:
+        group_profiles.forget(group_id)
         logger.error(f"❌ Failed to save group {group_id}: {str(e)}")
 
+# One statement for one answer: upsert the user with its counters, log the attempt and bump group counters.
+# $7 (is_correct) doubles as the 0/1 counter increment.
+RECORD_ANSWER_SQL = '''
+    WITH user_row AS (
+        INSERT INTO users AS u (user_id, username, full_name, correct_answers, wrong_answers, total_quizzes, last_active)
+        VALUES ($1, '', '', $7::boolean::int, 1 - $7::boolean::int, 1, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id)
+        DO UPDATE SET
+            correct_answers = u.correct_answers + EXCLUDED.correct_answers,
+            wrong_answers = u.wrong_answers + EXCLUDED.wrong_answers,
+            total_quizzes = u.total_quizzes + 1,
+            last_active = CURRENT_TIMESTAMP
+        RETURNING u.user_id, u.full_name, u.correct_answers, u.wrong_answers, u.total_quizzes,
+                  1 AS delta, (u.xmax = 0) AS created
+    ), attempt AS (
+        INSERT INTO quiz_stats
+            (user_id, group_id, category, question, user_answer, correct_answer, is_correct, answered_at)
+        SELECT user_id, $2::bigint, $3::text, $4::text, $5::text, $6::text, $7::boolean, $8::timestamp FROM user_row
+    ), group_row AS (
+        INSERT INTO groups (group_id, group_title, group_username, quiz_count, last_active)
+        SELECT $2::bigint, '', '', 1, CURRENT_TIMESTAMP WHERE $2::bigint IS NOT NULL
+        ON CONFLICT (group_id)
+        DO UPDATE SET
+            quiz_count = groups.quiz_count + 1,
+            last_active = CURRENT_TIMESTAMP
+    ), member_row AS (
+        INSERT INTO group_user_stats
+            (group_id, user_id, correct_answers, wrong_answers, total_quizzes, last_answered)
+        SELECT $2::bigint, $1, $7::boolean::int, 1 - $7::boolean::int, 1, $8::timestamp WHERE $2::bigint IS NOT NULL
+        ON CONFLICT (group_id, user_id)
+        DO UPDATE SET
+            correct_answers = group_user_stats.correct_answers + EXCLUDED.correct_answers,
+            wrong_answers = group_user_stats.wrong_answers + EXCLUDED.wrong_answers,
+            total_quizzes = group_user_stats.total_quizzes + 1,
+            last_answered = EXCLUDED.last_answered
+    )
+    SELECT * FROM user_row
+'''
+
 async def record_quiz_answer(user_id: int, group_id: int, category: str, question: str, 
                            user_answer: str, correct_answer: str, is_correct: bool):
-    """Record quiz answer in database"""
+    """Record quiz answer in database, through the write-behind queue when it is running"""
     if not db_pool:
         logger.error("❌ Database pool not available for recording quiz answer")
         return
+    
+    answered_at = datetime.now()
+    if answer_writer.running:
+        answer_writer.add((user_id, group_id, category, question, user_answer,
+                           correct_answer, is_correct, answered_at))
+        logger.debug("📥 Quiz answer queued for user %s (queue: %s)", user_id, answer_writer.queue_depth)
+        return
         
     try:
-        async with db_pool.acquire() as connection:
-            # First ensure the user exists in the users table (CRITICAL for group users)
-            await connection.execute('''
-                INSERT INTO users (user_id, username, full_name, last_active)
-                VALUES ($1, '', '', CURRENT_TIMESTAMP)
-                ON CONFLICT (user_id) 
-                DO UPDATE SET last_active = CURRENT_TIMESTAMP
-            ''', user_id)
-            
-            logger.debug(f"👤 Ensured user {user_id} exists in users table")
-            
-            # Record the quiz attempt
-            await connection.execute('''
-                INSERT INTO quiz_stats 
-                (user_id, group_id, category, question, user_answer, correct_answer, is_correct)
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
-            ''', user_id, group_id, category, question, user_answer, correct_answer, is_correct)
-            
-            logger.debug(f"📊 Quiz stats recorded for user {user_id}")
+        async with db_acquire() as connection:
+            user_stats = await timed_query("record_answer", hot_query(connection, "record_answer", "fetchrow",
+                user_id, group_id, category, question, user_answer, correct_answer, is_correct, answered_at))
+        
+        if group_id:
+            bump_group_leaderboard(group_id)
+        leaderboard.observe([user_stats], attempts=1, new_users=int(user_stats['created']))
+        update_logger.info("✅ Quiz answer recorded successfully for user %s: %s", user_id, '✅' if is_correct else '❌')
+        update_logger.info("📍 Location: %s", 'Group ' + str(group_id) if group_id else 'Private chat')
+        
+        schedule_answer_audit(user_id, answered_at)
+        
+    except Exception as e:
+        logger.error(f"❌ Failed to record quiz answer for user {user_id}: {str(e)}")
+        logger.exception("Full traceback:")
+
+# ─── Answer Audit ───────────────────────────────────────────────────────────
+AUDIT_MODE = os.getenv("AUDIT_MODE", "off").lower()  # off | sampled | always
+AUDIT_SAMPLE_RATE = float(os.getenv("AUDIT_SAMPLE_RATE", "0.01"))
+AUDIT_QUEUE_SIZE = 1000
+
+audit_counters = {
+    "checked": 0,
+    "user_missing": 0,
+    "answer_missing": 0,
+    "counter_mismatch": 0,
+    "errors": 0,
+    "dropped": 0,
+}
+audit_queue: asyncio.Queue = asyncio.Queue(maxsize=AUDIT_QUEUE_SIZE)
+
+def schedule_answer_audit(user_id: int, answered_at: datetime):
+    """Queue a recorded answer for a background check according to AUDIT_MODE"""
+    if AUDIT_MODE == "off":
+        return
+    if AUDIT_MODE == "sampled" and random.random() >= AUDIT_SAMPLE_RATE:
+        return
+    try:
+        audit_queue.put_nowait((user_id, answered_at))
+    except asyncio.QueueFull:
+        audit_counters["dropped"] += 1
+
+async def audit_answer(user_id: int, answered_at: datetime):
+    """Check that a recorded answer and the user counters made it to the database"""
+    async with db_acquire() as connection:
+        row = await connection.fetchrow('''
+            SELECT u.total_quizzes, u.correct_answers, u.wrong_answers,
+                   EXISTS (
+                       SELECT 1 FROM quiz_stats
+                       WHERE user_id = $1 AND answered_at = $2
+                   ) AS answer_saved
+            FROM users u WHERE u.user_id = $1
+        ''', user_id, answered_at)
+    
+    audit_counters["checked"] += 1
+    if not row:
+        audit_counters["user_missing"] += 1
+        logger.error(f"❌ AUDIT: Could not find user {user_id} after saving!")
+        return
+    if not row['answer_saved']:
+        audit_counters["answer_missing"] += 1
+        logger.error(f"❌ AUDIT: Quiz answer NOT found in database for user {user_id} at {answered_at}")
+    if row['total_quizzes'] != row['correct_answers'] + row['wrong_answers']:
+        audit_counters["counter_mismatch"] += 1
+        logger.error(f"❌ AUDIT: Counter mismatch for user {user_id}: {dict(row)}")
+
+async def audit_worker():
+    """Run queued answer audits off the update path"""
+    logger.info(f"🔎 Answer audit worker started (mode: {AUDIT_MODE}, sample rate: {AUDIT_SAMPLE_RATE})")
+    while True:
+        user_id, answered_at = await audit_queue.get()
+        try:
+            await audit_answer(user_id, answered_at)
+        except Exception as e:
+            audit_counters["errors"] += 1
+            logger.warning(f"⚠️ Answer audit failed for user {user_id}: {str(e)}")
+        
+        if audit_counters["checked"] and audit_counters["checked"] % 100 == 0:
+            logger.info(f"🔎 Audit counters: {audit_counters}")
+
+async def write_answer_batch(batch: List[tuple]):
+    """Write a batch of quiz answers with pre-aggregated counter deltas"""
+    user_deltas: Dict[int, List[int]] = {}  # user_id -> [correct, wrong]
+    group_deltas: Dict[int, int] = {}  # group_id -> quiz count
+    member_deltas: Dict[Tuple[int, int], List] = {}  # (group_id, user_id) -> [correct, wrong, last answered]
+    for user_id, group_id, _, _, _, _, is_correct, answered_at in batch:
+        deltas = user_deltas.setdefault(user_id, [0, 0])
+        deltas[0 if is_correct else 1] += 1
+        if group_id:
+            group_deltas[group_id] = group_deltas.get(group_id, 0) + 1
+            member = member_deltas.setdefault((group_id, user_id), [0, 0, answered_at])
+            member[0 if is_correct else 1] += 1
+            member[2] = max(member[2], answered_at)
+    
+    # Sorted keys keep row lock order stable across concurrent writers
+    user_keys = sorted(user_deltas)
+    group_keys = sorted(group_deltas)
+    member_keys = sorted(member_deltas)
+    
+    started = time.perf_counter()
+    async with db_acquire() as connection:
+        async with connection.transaction():
+            # Create missing users and bump counters in one upsert (before COPY, for the users foreign key)
+            user_rows = await connection.fetch('''
+                INSERT INTO users AS u
+                    (user_id, username, full_name, correct_answers, wrong_answers, total_quizzes, last_active)
+                SELECT user_id, '', '', correct, wrong, correct + wrong, CURRENT_TIMESTAMP
+                FROM unnest($1::bigint[], $2::int[], $3::int[]) AS d(user_id, correct, wrong)
+                ON CONFLICT (user_id)
+                DO UPDATE SET
+                    correct_answers = u.correct_answers + EXCLUDED.correct_answers,
+                    wrong_answers = u.wrong_answers + EXCLUDED.wrong_answers,
+                    total_quizzes = u.total_quizzes + EXCLUDED.total_quizzes,
+                    last_active = CURRENT_TIMESTAMP
+                RETURNING u.user_id, u.full_name, u.correct_answers, u.wrong_answers, u.total_quizzes,
+                          (u.xmax = 0) AS created
+            ''', user_keys, [user_deltas[k][0] for k in user_keys], [user_deltas[k][1] for k in user_keys])
             
-            # Update user statistics
-            if is_correct:
-                result = await connection.execute('''
-                    UPDATE users 
-                    SET correct_answers = correct_answers + 1,
-                        total_quizzes = total_quizzes + 1,
-                        last_active = CURRENT_TIMESTAMP
-                    WHERE user_id = $1
-                ''', user_id)
-                logger.debug(f"✅ Updated correct answer count for user {user_id}")
-            else:
-                result = await connection.execute('''
-                    UPDATE users 
-                    SET wrong_answers = wrong_answers + 1,
-                        total_quizzes = total_quizzes + 1,
-                        last_active = CURRENT_TIMESTAMP
-                    WHERE user_id = $1
-                ''', user_id)
-                logger.debug(f"❌ Updated wrong answer count for user {user_id}")
+            await connection.copy_records_to_table(
+                'quiz_stats',
+                records=batch,
+                columns=['user_id', 'group_id', 'category', 'question', 'user_answer',
+                         'correct_answer', 'is_correct', 'answered_at'],
+            )
             
-            # Update group quiz count if it's a group (but don't require group to exist)
-            if group_id:
+            if group_keys:
                 await connection.execute('''
                     INSERT INTO groups (group_id, group_title, group_username, quiz_count, last_active)
-                    VALUES ($1, '', '', 1, CURRENT_TIMESTAMP)
+                    SELECT group_id, '', '', quiz_count, CURRENT_TIMESTAMP
+                    FROM unnest($1::bigint[], $2::int[]) AS d(group_id, quiz_count)
                     ON CONFLICT (group_id) 
                     DO UPDATE SET 
-                        quiz_count = groups.quiz_count + 1,
+                        quiz_count = groups.quiz_count + EXCLUDED.quiz_count,
                         last_active = CURRENT_TIMESTAMP
-                ''', group_id)
-                logger.debug(f"📢 Updated group {group_id} quiz count")
+                ''', group_keys, [group_deltas[k] for k in group_keys])
                 
-        logger.info(f"✅ Quiz answer recorded successfully for user {user_id}: {'✅' if is_correct else '❌'}")
-        logger.info(f"📍 Location: {'Group ' + str(group_id) if group_id else 'Private chat'}")
-        
-        # Verify the data was saved by checking user stats
-        async with db_pool.acquire() as connection:
-            user_stats = await connection.fetchrow('''
-                SELECT total_quizzes, correct_answers, wrong_answers 
-                FROM users WHERE user_id = $1
-            ''', user_id)
-            if user_stats:
-                logger.info(f"📊 User {user_id} updated stats: {user_stats['total_quizzes']} total, {user_stats['correct_answers']} correct, {user_stats['wrong_answers']} wrong")
-            else:
-                logger.error(f"❌ CRITICAL: Could not find user {user_id} after saving!")
+                await connection.execute('''
+                    INSERT INTO group_user_stats
+                        (group_id, user_id, correct_answers, wrong_answers, total_quizzes, last_answered)
+                    SELECT group_id, user_id, correct, wrong, correct + wrong, last_answered
+                    FROM unnest($1::bigint[], $2::bigint[], $3::int[], $4::int[], $5::timestamp[])
+                        AS d(group_id, user_id, correct, wrong, last_answered)
+                    ON CONFLICT (group_id, user_id)
+                    DO UPDATE SET
+                        correct_answers = group_user_stats.correct_answers + EXCLUDED.correct_answers,
+                        wrong_answers = group_user_stats.wrong_answers + EXCLUDED.wrong_answers,
+                        total_quizzes = group_user_stats.total_quizzes + EXCLUDED.total_quizzes,
+                        last_answered = GREATEST(group_user_stats.last_answered, EXCLUDED.last_answered)
+                ''', [k[0] for k in member_keys], [k[1] for k in member_keys],
+                    [member_deltas[k][0] for k in member_keys], [member_deltas[k][1] for k in member_keys],
+                    [member_deltas[k][2] for k in member_keys])
+    
+    db_statement_seconds.observe(time.perf_counter() - started, "answer_batch")
+    user_stats = [dict(row, delta=sum(user_deltas[row['user_id']])) for row in user_rows]
+    created = [row for row in user_rows if row['created']]
+    leaderboard.observe(user_stats, attempts=len(batch), new_users=len(created))
+    for group_id in group_keys:
+        bump_group_leaderboard(group_id)
+    logger.info(f"💾 Flushed {len(batch)} quiz answers for {len(user_keys)} users and {len(group_keys)} groups")
+    
+    for record in batch:
+        schedule_answer_audit(record[0], record[7])
+
+ANSWER_FLUSH_INTERVAL_MS = int(os.getenv("ANSWER_FLUSH_INTERVAL_MS", "500"))
+ANSWER_FLUSH_BATCH_SIZE = int(os.getenv("ANSWER_FLUSH_BATCH_SIZE", "200"))
+WRITE_BEHIND_MAX_BATCHES = 50  # Keep failed batches only up to this many batches
+
+class WriteBehindQueue:
+    """Buffer records in memory and flush them with `write_batch` every N ms or M records"""
+    
+    def __init__(self, name: str, write_batch, flush_interval_ms: int, batch_size: int):
+        self.name = name
+        self.write_batch = write_batch
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.max_backlog = batch_size * WRITE_BEHIND_MAX_BATCHES
+        self.buffer: List[tuple] = []
+        self.wakeup = asyncio.Event()
+        self.flush_lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+        self.stopping = False
+    
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+    
+    @property
+    def queue_depth(self) -> int:
+        return len(self.buffer)
+    
+    def start(self):
+        """Start the background flusher"""
+        self.stopping = False
+        self.task = asyncio.create_task(self.run())
+    
+    def add(self, record: tuple):
+        """Queue one record, waking the flusher when a batch is full"""
+        self.buffer.append(record)
+        if len(self.buffer) >= self.batch_size:
+            self.wakeup.set()
+    
+    async def run(self):
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            await self.flush()
+    
+    async def flush(self):
+        """Write every buffered record in batches of at most batch_size"""
+        async with self.flush_lock:
+            while self.buffer:
+                batch = self.buffer[:self.batch_size]
+                del self.buffer[:self.batch_size]
+                try:
+                    await self.write_batch(batch)
+                except asyncio.CancelledError:
+                    # Cancelled mid-write: keep the batch for whoever flushes next
+                    self.buffer[:0] = batch
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Failed to flush {len(batch)} {self.name}: {str(e)}")
+                    # Put the batch back for the next flush unless the backlog is already too big
+                    if len(self.buffer) + len(batch) <= self.max_backlog:
+                        self.buffer[:0] = batch
+                    else:
+                        logger.error(f"❌ Dropping {len(batch)} {self.name}, write-behind backlog is full")
+                    break
+    
+    async def stop(self):
+        """Stop the flusher after its current flush and write out whatever is still buffered"""
+        if self.task:
+            self.stopping = True
+            self.wakeup.set()
+            await self.task
+            self.task = None
+        await self.flush()
+
+answer_writer = WriteBehindQueue("quiz answers", write_answer_batch, ANSWER_FLUSH_INTERVAL_MS, ANSWER_FLUSH_BATCH_SIZE)
+
+# ─── Profile Write Coalescing ───────────────────────────────────────────────
+PROFILE_TOUCH_SECONDS = int(os.getenv("PROFILE_TOUCH_SECONDS", "300"))  # Rewrite last_active at most this often
+PROFILE_CACHE_MAX = int(os.getenv("PROFILE_CACHE_MAX", "200000"))
+PROFILE_FLUSH_INTERVAL_MS = int(os.getenv("PROFILE_FLUSH_INTERVAL_MS", "1000"))
+
+class ProfileCache:
+    """Last written profile per id (LRU-bounded), used to skip upserts that would change nothing"""
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.entries: OrderedDict = OrderedDict()  # id -> (fields, written_at)
+        self.skipped = 0
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def touch(self, key: int, fields: tuple) -> bool:
+        """Return True when the profile changed or last_active is stale and a write is needed"""
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == fields and now - entry[1] < PROFILE_TOUCH_SECONDS:
+            self.entries.move_to_end(key)
+            self.skipped += 1
+            return False
         
-    except Exception as e:
-        logger.error(f"❌ Failed to record quiz answer for user {user_id}: {str(e)}")
-        logger.exception("Full traceback:")
+        self.entries[key] = (fields, now)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return True
+    
+    def forget(self, key: int):
+        """Drop a profile whose write failed so the next sighting writes it again"""
+        self.entries.pop(key, None)
+
+user_profiles = ProfileCache(PROFILE_CACHE_MAX)
+group_profiles = ProfileCache(PROFILE_CACHE_MAX)
+
+USER_PROFILES_SQL = '''
+    INSERT INTO users (user_id, username, full_name, last_active)
+    SELECT * FROM unnest($1::bigint[], $2::varchar[], $3::varchar[], $4::timestamp[])
+    ON CONFLICT (user_id)
+    DO UPDATE SET
+        username = EXCLUDED.username,
+        full_name = EXCLUDED.full_name,
+        last_active = GREATEST(users.last_active, EXCLUDED.last_active)
+    RETURNING user_id, full_name, (xmax = 0) AS inserted
+'''
+
+async def write_user_profiles(batch: List[tuple]):
+    """Upsert the latest profile of every user in the batch with one statement"""
+    latest = {record[0]: record for record in batch}
+    user_keys = sorted(latest)
+    async with db_acquire() as connection:
+        rows = await timed_query("user_profiles", hot_query(connection, "user_profiles", "fetch",
+            user_keys, [latest[k][1] for k in user_keys], [latest[k][2] for k in user_keys],
+            [latest[k][3] for k in user_keys]))
+    
+    for row in rows:
+        leaderboard.observe_profile(row['user_id'], row['full_name'], created=row['inserted'])
+    logger.debug(f"💾 Flushed {len(user_keys)} user profiles")
+
+async def write_group_profiles(batch: List[tuple]):
+    """Upsert the latest profile of every group in the batch with one statement"""
+    latest = {record[0]: record for record in batch}
+    group_keys = sorted(latest)
+    async with db_acquire() as connection:
+        await timed_query("group_profiles", connection.execute('''
+            INSERT INTO groups (group_id, group_title, group_username, last_active)
+            SELECT * FROM unnest($1::bigint[], $2::varchar[], $3::varchar[], $4::timestamp[])
+            ON CONFLICT (group_id)
+            DO UPDATE SET
+                group_title = EXCLUDED.group_title,
+                group_username = EXCLUDED.group_username,
+                last_active = GREATEST(groups.last_active, EXCLUDED.last_active)
+        ''', group_keys, [latest[k][1] for k in group_keys], [latest[k][2] for k in group_keys],
+            [latest[k][3] for k in group_keys]))
+    logger.debug(f"💾 Flushed {len(group_keys)} group profiles")
+
+user_profile_writer = WriteBehindQueue("user profiles", write_user_profiles, PROFILE_FLUSH_INTERVAL_MS, 500)
+group_profile_writer = WriteBehindQueue("group profiles", write_group_profiles, PROFILE_FLUSH_INTERVAL_MS, 500)
+
+def profile_writers_running() -> bool:
+    return user_profile_writer.running and group_profile_writer.running
+
+LEADERBOARD_SQL = '''
+    SELECT user_id, username, full_name, correct_answers, wrong_answers, total_quizzes,
+           CASE 
+               WHEN total_quizzes > 0 THEN 
+                   ROUND((correct_answers::DECIMAL / total_quizzes::DECIMAL) * 100, 1)
+               ELSE 0 
+           END as accuracy
+    FROM users 
+    WHERE total_quizzes > 0
+    ORDER BY correct_answers DESC, accuracy DESC, total_quizzes DESC
+    LIMIT $1
+'''
+
+GROUP_LEADERBOARD_SQL = '''
+    SELECT s.user_id, u.full_name, s.correct_answers, s.wrong_answers, s.total_quizzes,
+           ROUND((s.correct_answers::DECIMAL / s.total_quizzes::DECIMAL) * 100, 1) AS accuracy
+    FROM group_user_stats s
+    JOIN users u ON u.user_id = s.user_id
+    WHERE s.group_id = $1 AND s.total_quizzes > 0
+    ORDER BY s.correct_answers DESC, accuracy DESC, s.total_quizzes DESC
+    LIMIT $2
+'''
 
 async def get_leaderboard(limit: int = 20):
     """Get top players leaderboard"""
@@ -351,35 +1233,12 @@ async def get_leaderboard(limit: int = 20):
         return []
         
     try:
-        async with db_pool.acquire() as connection:
-            # Debug: Check what we have in the database
-            total_users = await connection.fetchval("SELECT COUNT(*) FROM users")
-            users_with_quizzes = await connection.fetchval("SELECT COUNT(*) FROM users WHERE total_quizzes > 0")
-            total_quiz_stats = await connection.fetchval("SELECT COUNT(*) FROM quiz_stats")
-            
-            logger.info(f"📊 Leaderboard query - Total users: {total_users}, With quizzes: {users_with_quizzes}, Quiz stats: {total_quiz_stats}")
-            
+        async with db_acquire() as connection:
             # Get leaderboard data including users who only answered in groups
-            rows = await connection.fetch('''
-                SELECT user_id, username, full_name, correct_answers, wrong_answers, total_quizzes,
-                       CASE 
-                           WHEN total_quizzes > 0 THEN 
-                               ROUND((correct_answers::DECIMAL / total_quizzes::DECIMAL) * 100, 1)
-                           ELSE 0 
-                       END as accuracy
-                FROM users 
-                WHERE total_quizzes > 0
-                ORDER BY correct_answers DESC, accuracy DESC, total_quizzes DESC
-                LIMIT $1
-            ''', limit)
+            rows = await timed_query("get_leaderboard", hot_query(connection, "leaderboard", "fetch", limit))
             
             logger.info(f"📋 Leaderboard query returned {len(rows)} players")
             
-            # Debug: Show sample data
-            if rows:
-                for i, row in enumerate(rows[:3]):  # Show top 3
-                    logger.info(f"   #{i+1}: {row['full_name']} - {row['correct_answers']} correct, {row['wrong_answers']} wrong, {row['total_quizzes']} total")
-            
         return rows
         
     except Exception as e:
@@ -387,164 +1246,1124 @@ async def get_leaderboard(limit: int = 20):
         logger.exception("Full traceback:")
         return []
 
-async def get_all_user_ids():
-    """Get all user IDs for broadcasting"""
+async def get_group_leaderboard(group_id: int, limit: int = 20):
+    """Get top players of one group from the group_user_stats aggregate"""
     if not db_pool:
-        return set()
+        return []
         
     try:
-        async with db_pool.acquire() as connection:
-            rows = await connection.fetch('SELECT user_id FROM users')
-            return set(row['user_id'] for row in rows)
+        async with db_acquire() as connection:
+            rows = await timed_query("get_group_leaderboard", hot_query(connection, "group_leaderboard", "fetch",
+                                                                        group_id, limit))
             
-    except Exception as e:
-        logger.error(f"❌ Failed to get user IDs: {str(e)}")
-        return set()
-
-async def get_all_group_ids():
-    """Get all group IDs for broadcasting"""
-    if not db_pool:
-        return set()
-        
-    try:
-        async with db_pool.acquire() as connection:
-            rows = await connection.fetch('SELECT group_id FROM groups')
-            return set(row['group_id'] for row in rows)
+            logger.info(f"📋 Group {group_id} leaderboard query returned {len(rows)} players")
             
+        return rows
+        
     except Exception as e:
-        logger.error(f"❌ Failed to get group IDs: {str(e)}")
-        return set()
+        logger.error(f"❌ Failed to get leaderboard for group {group_id}: {str(e)}")
+        return []
 
-CATEGORIES = {
-    "general":   (9,  "🧠", "General Knowledge"),
-    "books":     (10, "📚", "Book Trivia"),
-    "film":      (11, "🎬", "Movie Quiz"),
-    "music":     (12, "🎵", "Music Trivia"),
-    "musicals":  (13, "🎭", "Musical Theater"),
-    "tv":        (14, "📺", "TV Shows"),
-    "games":     (15, "🎮", "Video Games"),
-    "board":     (16, "🎲", "Board Games"),
-    "nature":    (17, "🌿", "Nature Science"),
-    "computers": (18, "💻", "Tech & Science"),
-    "math":      (19, "➗", "Math Quiz"),
-    "mythology": (20, "⚡", "Mythology Quiz"),
-    "sports":    (21, "🏅", "Sports Trivia"),
-    "geography": (22, "🌍", "Geography Quiz"),
-    "history":   (23, "📜", "History Quiz"),
-    "politics":  (24, "🏛️", "Politics Quiz"),
-    "art":       (25, "🎨", "Art Design"),
-    "celebs":    (26, "⭐", "Celebrity Quiz"),
-    "animals":   (27, "🐾", "Animal Quiz"),
-    "vehicles":  (28, "🚗", "Vehicle Quiz"),
-    "comics":    (29, "💥", "Comic Books"),
-    "gadgets":   (30, "📱", "Science Gadgets"),
-    "anime":     (31, "🀄", "Anime Quiz"),
-    "cartoons":  (32, "🎪", "Cartoon Quiz"),
+# Statements prepared on every pooled connection by init_db_connection
+HOT_STATEMENTS = {
+    "save_user": SAVE_USER_SQL,
+    "record_answer": RECORD_ANSWER_SQL,
+    "user_profiles": USER_PROFILES_SQL,
+    "leaderboard": LEADERBOARD_SQL,
+    "group_leaderboard": GROUP_LEADERBOARD_SQL,
 }
 
-logger.info(f"📋 Loaded {len(CATEGORIES)} quiz categories successfully")
-
-session: aiohttp.ClientSession = None
-semaphore = asyncio.Semaphore(5)
-user_ids: Set[int] = set()
-group_ids: Set[int] = set()
-broadcast_mode: Set[int] = set()
-broadcast_target: dict = {}  # Store broadcast target choice for each owner
-auto_quiz_active_groups: Set[int] = set()  # Groups where auto-quiz is active
+# ─── In-Memory Leaderboard ──────────────────────────────────────────────────
+LEADERBOARD_CAPACITY = int(os.getenv("LEADERBOARD_CAPACITY", "200"))
+LEADERBOARD_DISPLAY_SIZE = 20
+# Workers only see the answers routed to them, so they reload from the database more often
+LEADERBOARD_RECONCILE_SECONDS = int(os.getenv("LEADERBOARD_RECONCILE_SECONDS",
+                                              "30" if BOT_MODE == "worker" else "300"))
 
-# User throttling to prevent spam and rate limit issues
-user_last_request = {}
-user_processing = set()  # Track users currently processing requests
-USER_COOLDOWN = 2  # seconds between requests per user
+def accuracy_percent(correct: int, total: int) -> float:
+    """Accuracy rounded like the leaderboard SQL expression"""
+    return round(correct / total * 100, 1) if total > 0 else 0
+
+class LeaderboardService:
+    """Top-K leaderboard and running totals kept in memory from recorded answers"""
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.players: Dict[int, dict] = {}  # user_id -> player entry, at most `capacity`
+        self.total_users = 0
+        self.users_with_quizzes = 0
+        self.total_quiz_attempts = 0
+        self.loaded = False
+        self.top_players: List[dict] = []  # Displayed top players in leaderboard order
+        self.version = 0  # Bumped whenever the displayed top players change
+        self.journal: Optional[List[tuple]] = None  # Observations made while a reload is fetching
+    
+    @staticmethod
+    def rank_key(player: dict):
+        return (player['correct_answers'], player['accuracy'], player['total_quizzes'])
+    
+    @staticmethod
+    def make_entry(row) -> dict:
+        return {
+            'user_id': row['user_id'],
+            'full_name': row['full_name'],
+            'correct_answers': row['correct_answers'],
+            'wrong_answers': row['wrong_answers'],
+            'total_quizzes': row['total_quizzes'],
+            'accuracy': accuracy_percent(row['correct_answers'], row['total_quizzes']),
+        }
+    
+    async def load(self):
+        """Load the top-K and the totals from the database, keeping answers observed meanwhile"""
+        self.journal = []
+        try:
+            rows = await get_leaderboard(self.capacity)
+            async with db_acquire() as connection:
+                totals = await connection.fetchrow('''
+                    SELECT COUNT(*) AS total_users,
+                           COUNT(*) FILTER (WHERE total_quizzes > 0) AS users_with_quizzes,
+                           COALESCE(SUM(total_quizzes), 0) AS total_quiz_attempts
+                    FROM users
+                ''')
+        finally:
+            journal, self.journal = self.journal, None
+        
+        self.players = {row['user_id']: self.make_entry(row) for row in rows}
+        self.total_users = totals['total_users']
+        self.users_with_quizzes = totals['users_with_quizzes']
+        self.total_quiz_attempts = totals['total_quiz_attempts']
+        self.loaded = True
+        
+        # Replay player updates the snapshot may have missed; they carry absolute totals, so a
+        # replay is harmless. Counter deltas are not replayed: the totals query already saw them.
+        for apply, args in journal:
+            apply(*args)
+        self.refresh_top()
+        logger.info(f"🏆 Leaderboard loaded: {len(self.players)} top players, {self.total_users} users, "
+                    f"{self.users_with_quizzes} with quizzes, {self.total_quiz_attempts} attempts")
+    
+    def observe(self, rows, attempts: int, new_users: int = 0):
+        """Apply updated user totals returned by the answer write path"""
+        self.total_quiz_attempts += attempts
+        self.total_users += new_users
+        self.users_with_quizzes += sum(1 for row in rows if row['total_quizzes'] == row['delta'])
+        self.apply_players(rows)
+        if self.journal is not None:
+            self.journal.append((self.apply_players, (rows,)))
+        
+        if rows:
+            self.refresh_top()
+    
+    def apply_players(self, rows):
+        """Update the top-K entries from rows carrying a player's absolute totals"""
+        for row in rows:
+            entry = self.make_entry(row)
+            user_id = entry['user_id']
+            if user_id in self.players or len(self.players) < self.capacity:
+                self.players[user_id] = entry
+                continue
+            
+            lowest = min(self.players.values(), key=self.rank_key)
+            if self.rank_key(entry) > self.rank_key(lowest):
+                del self.players[lowest['user_id']]
+                self.players[user_id] = entry
+    
+    def observe_profile(self, user_id: int, full_name: str, created: bool = False):
+        """Keep names in sync and count newly created users"""
+        if created:
+            self.total_users += 1
+        if self.journal is not None:
+            self.journal.append((self.apply_name, (user_id, full_name)))
+        if self.apply_name(user_id, full_name):
+            self.refresh_top()
+    
+    def apply_name(self, user_id: int, full_name: str) -> bool:
+        """Rename a listed player, returning True when the name changed"""
+        player = self.players.get(user_id)
+        if player and player['full_name'] != full_name:
+            player['full_name'] = full_name
+            return True
+        return False
+    
+    def refresh_top(self):
+        """Recompute the displayed top players and bump the version if they changed"""
+        top_players = sorted(self.players.values(), key=self.rank_key, reverse=True)[:LEADERBOARD_DISPLAY_SIZE]
+        # Entries are replaced on update, so comparing copies detects any visible change
+        top_players = [dict(player) for player in top_players]
+        if top_players != self.top_players:
+            self.top_players = top_players
+            self.version += 1
+    
+    def top(self, limit: int = LEADERBOARD_DISPLAY_SIZE) -> List[dict]:
+        """Return the best `limit` players in leaderboard order"""
+        if limit <= LEADERBOARD_DISPLAY_SIZE:
+            return self.top_players[:limit]
+        return sorted(self.players.values(), key=self.rank_key, reverse=True)[:limit]
+
+leaderboard = LeaderboardService(LEADERBOARD_CAPACITY)
+
+# Rendered leaderboard messages: cache key -> (data version, message text)
+leaderboard_render_cache: Dict[str, Tuple[int, str]] = {}
+group_leaderboard_versions: Dict[int, int] = {}  # group_id -> version bumped on every recorded answer
+
+def bump_group_leaderboard(group_id: int):
+    """Invalidate the rendered leaderboard of a group"""
+    group_leaderboard_versions[group_id] = group_leaderboard_versions.get(group_id, 0) + 1
+
+def render_leaderboard(players: List[dict], title: str = "iQ Lost Leaderboard") -> str:
+    """Build the HTML leaderboard message for a list of players"""
+    text = f"🏆 <b>{title}</b> 🏆\n\n"
+    text += "<blockquote expandable>\n"
+    
+    medals = ["🥇", "🥈", "🥉"]
+    
+    for i, player in enumerate(players, 1):
+        user_id = player['user_id']
+        full_name = player['full_name'] or "Unknown Player"
+        correct = player['correct_answers']
+        wrong = player['wrong_answers']
+        total = player['total_quizzes']
+        accuracy = player['accuracy']
+        
+        # Create clickable mention
+        user_mention = f"<a href='tg://user?id={user_id}'>{full_name}</a>"
+        
+        # Get medal or rank number
+        if i <= 3:
+            rank_icon = medals[i-1]
+            text += f"{rank_icon} <b>{user_mention}</b>\n"
+        else:
+            text += f"{i}. <b>{user_mention}</b>\n"
+        
+        text += f" ╰─ W: {correct} | L: {wrong} | T: {total} | A: {accuracy}%\n\n"
+    
+    text += "</blockquote>\n\n"
+    text += f"🎗️ <b>Only top 20 shown! Total players: {len(players)}</b>"
+    return text
+
+def get_cached_leaderboard_text(key: str, version: int, players: List[dict],
+                                title: str = "iQ Lost Leaderboard") -> str:
+    """Return the rendered leaderboard for `key`, re-rendering only when `version` changed"""
+    cached = leaderboard_render_cache.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+    
+    text = render_leaderboard(players, title)
+    leaderboard_render_cache[key] = (version, text)
+    logger.debug(f"🖌️ Leaderboard '{key}' re-rendered for version {version}")
+    return text
+
+async def get_group_leaderboard_text(group_id: int, group_title: str) -> Optional[str]:
+    """Return the rendered leaderboard of a group, querying only after it changed"""
+    key = f"group:{group_id}"
+    version = group_leaderboard_versions.get(group_id, 0)
+    cached = leaderboard_render_cache.get(key)
+    if cached and cached[0] == version:
+        return cached[1]
+    
+    rows = await get_group_leaderboard(group_id, LEADERBOARD_DISPLAY_SIZE)
+    if not rows:
+        return None
+    
+    players = [LeaderboardService.make_entry(row) for row in rows]
+    return get_cached_leaderboard_text(key, version, players, f"{escape(group_title)} Leaderboard")
+
+async def leaderboard_reconcile_loop():
+    """Periodically reload the in-memory leaderboard from the database"""
+    while True:
+        await asyncio.sleep(LEADERBOARD_RECONCILE_SECONDS)
+        try:
+            await leaderboard.load()
+        except Exception as e:
+            logger.error(f"❌ Leaderboard reconciliation failed: {str(e)}")
+        
+        if BOT_MODE == "worker":
+            # Answers routed to other workers never bump our local versions
+            for key in [key for key in leaderboard_render_cache if key.startswith("group:")]:
+                del leaderboard_render_cache[key]
+
+async def get_all_user_ids():
+    """Get all user IDs for broadcasting"""
+    if not db_pool:
+        return set()
+        
+    try:
+        async with db_acquire() as connection:
+            rows = await connection.fetch('SELECT user_id FROM users')
+            return set(row['user_id'] for row in rows)
+            
+    except Exception as e:
+        logger.error(f"❌ Failed to get user IDs: {str(e)}")
+        return set()
+
+async def get_all_group_ids():
+    """Get all group IDs for broadcasting"""
+    if not db_pool:
+        return set()
+        
+    try:
+        async with db_acquire() as connection:
+            rows = await connection.fetch('SELECT group_id FROM groups')
+            return set(row['group_id'] for row in rows)
+            
+    except Exception as e:
+        logger.error(f"❌ Failed to get group IDs: {str(e)}")
+        return set()
+
+def question_hash(question: str, correct_answer: str) -> str:
+    """Build a content hash from the normalized question and correct answer"""
+    normalized = " ".join(f"{question}\n{correct_answer}".lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+async def save_questions(category_id: int, questions: List[Tuple[str, str, List[str]]]):
+    """Store parsed questions in the question bank, skipping known ones"""
+    if not db_pool or not questions:
+        return
+        
+    try:
+        async with db_acquire() as connection:
+            await connection.executemany('''
+                INSERT INTO questions (question_hash, category_id, question, correct_answer, incorrect_answers)
+                VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT (question_hash) DO NOTHING
+            ''', [
+                (question_hash(q, correct), category_id, q, correct, incorrect)
+                for q, correct, incorrect in questions
+            ])
+            
+        logger.debug(f"🏦 Saved {len(questions)} questions to bank for category {category_id}")
+        
+    except Exception as e:
+        logger.error(f"❌ Failed to save questions for category {category_id}: {str(e)}")
+
+async def get_bank_questions(category_id: int, limit: int = 1):
+    """Get random questions for a category from the question bank"""
+    if not db_pool:
+        return []
+        
+    try:
+        async with db_acquire() as connection:
+            # Start at a random point of the indexed rand_key and wrap around if needed
+            rows = await connection.fetch('''
+                (SELECT question, correct_answer, incorrect_answers FROM questions
+                 WHERE category_id = $1 AND rand_key >= $2
+                 ORDER BY rand_key LIMIT $3)
+                UNION ALL
+                (SELECT question, correct_answer, incorrect_answers FROM questions
+                 WHERE category_id = $1 AND rand_key < $2
+                 ORDER BY rand_key LIMIT $3)
+                LIMIT $3
+            ''', category_id, random.random(), limit)
+            
+        return [(row['question'], row['correct_answer'], list(row['incorrect_answers'])) for row in rows]
+        
+    except Exception as e:
+        logger.error(f"❌ Failed to get bank questions for category {category_id}: {str(e)}")
+        return []
+
+async def count_bank_questions(category_id: int) -> int:
+    """Count questions stored in the question bank for a category"""
+    if not db_pool:
+        return 0
+        
+    try:
+        async with db_acquire() as connection:
+            return await connection.fetchval(
+                "SELECT COUNT(*) FROM questions WHERE category_id = $1", category_id
+            )
+            
+    except Exception as e:
+        logger.error(f"❌ Failed to count bank questions for category {category_id}: {str(e)}")
+        return 0
+
+CATEGORIES = {
+    "general":   (9,  "🧠", "General Knowledge"),
+    "books":     (10, "📚", "Book Trivia"),
+    "film":      (11, "🎬", "Movie Quiz"),
+    "music":     (12, "🎵", "Music Trivia"),
+    "musicals":  (13, "🎭", "Musical Theater"),
+    "tv":        (14, "📺", "TV Shows"),
+    "games":     (15, "🎮", "Video Games"),
+    "board":     (16, "🎲", "Board Games"),
+    "nature":    (17, "🌿", "Nature Science"),
+    "computers": (18, "💻", "Tech & Science"),
+    "math":      (19, "➗", "Math Quiz"),
+    "mythology": (20, "⚡", "Mythology Quiz"),
+    "sports":    (21, "🏅", "Sports Trivia"),
+    "geography": (22, "🌍", "Geography Quiz"),
+    "history":   (23, "📜", "History Quiz"),
+    "politics":  (24, "🏛️", "Politics Quiz"),
+    "art":       (25, "🎨", "Art Design"),
+    "celebs":    (26, "⭐", "Celebrity Quiz"),
+    "animals":   (27, "🐾", "Animal Quiz"),
+    "vehicles":  (28, "🚗", "Vehicle Quiz"),
+    "comics":    (29, "💥", "Comic Books"),
+    "gadgets":   (30, "📱", "Science Gadgets"),
+    "anime":     (31, "🀄", "Anime Quiz"),
+    "cartoons":  (32, "🎪", "Cartoon Quiz"),
+}
+
+logger.info(f"📋 Loaded {len(CATEGORIES)} quiz categories successfully")
+
+class AsyncTokenBucket:
+    """Async token bucket limiter with FIFO waiters and a queue depth metric"""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate  # tokens per second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.waiting = 0
+        self._lock = asyncio.Lock()  # asyncio.Lock wakes waiters in FIFO order
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of callers currently waiting for a token"""
+        return self.waiting
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    async def acquire(self):
+        """Wait for a token, serving callers in arrival order"""
+        self.waiting += 1
+        try:
+            async with self._lock:
+                self._refill()
+                while self.tokens < 1:
+                    await asyncio.sleep((1 - self.tokens) / self.rate)
+                    self._refill()
+                self.tokens -= 1
+        finally:
+            self.waiting -= 1
+    
+    def set_rate(self, rate: float, burst: int):
+        """Change the refill rate, keeping the tokens earned at the old rate"""
+        self._refill()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = min(self.tokens, burst)
+    
+    def penalize(self, seconds: float):
+        """Drain the bucket so that the next token is only available after `seconds`"""
+        self._refill()
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+# ─── Outbound Send Scheduler ────────────────────────────────────────────────
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))  # Messages per second for the whole bot
+TELEGRAM_PRIVATE_RATE = float(os.getenv("TELEGRAM_PRIVATE_RATE", "1"))  # Messages per second per private chat
+TELEGRAM_GROUP_RATE_PER_MIN = float(os.getenv("TELEGRAM_GROUP_RATE_PER_MIN", "20"))  # Messages per minute per group
+TELEGRAM_CHAT_BURST = 3
+TELEGRAM_CHAT_BUCKETS_MAX = 10000  # Least recently used chat buckets are dropped past this size
+TELEGRAM_MAX_RETRIES = 3
+# Rate-limited API methods: everything that posts or edits a message in a chat
+TELEGRAM_LIMITED_PREFIXES = ("send", "copy", "forward", "edit")
+TELEGRAM_UNLIMITED_METHODS = {"sendChatAction"}
+# In worker mode the bot-wide limit is split between processes: the leader, which also sends
+# every auto-quiz fan-out and broadcast, keeps TELEGRAM_LEADER_SHARE of it and the other
+# workers split the rest. Per-chat limits stay whole because a chat is routed to one worker.
+TELEGRAM_LEADER_SHARE = float(os.getenv("TELEGRAM_LEADER_SHARE", "0.6"))
+
+if not 0 < TELEGRAM_LEADER_SHARE < 1:
+    raise ValueError("TELEGRAM_LEADER_SHARE must be between 0 and 1")
+
+def process_send_rate(leader: bool) -> float:
+    """Messages per second this process may send"""
+    if BOT_MODE != "worker" or WORKER_COUNT == 1:
+        return TELEGRAM_GLOBAL_RATE
+    if leader:
+        return TELEGRAM_GLOBAL_RATE * TELEGRAM_LEADER_SHARE
+    return TELEGRAM_GLOBAL_RATE * (1 - TELEGRAM_LEADER_SHARE) / (WORKER_COUNT - 1)
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0  # Replies to commands, quiz polls and callbacks
+PRIORITY_AUTO_QUIZ = 1
+PRIORITY_BROADCAST = 2
+
+send_priority: contextvars.ContextVar = contextvars.ContextVar("send_priority", default=PRIORITY_INTERACTIVE)
+
+class PriorityTokenBucket(AsyncTokenBucket):
+    """Token bucket that hands out tokens by priority, then in arrival order"""
+    
+    def __init__(self, rate: float, burst: int = 1):
+        super().__init__(rate, burst)
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.sequence = 0
+        self.dispatcher: Optional[asyncio.Task] = None
+    
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE):
+        """Wait for a token behind every caller of a more urgent priority"""
+        future = asyncio.get_running_loop().create_future()
+        self.sequence += 1
+        heapq.heappush(self.waiters, (priority, self.sequence, future))
+        self.waiting += 1
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.create_task(self.dispatch())
+        try:
+            await future
+        finally:
+            self.waiting -= 1
+    
+    async def dispatch(self):
+        while self.waiters:
+            self._refill()
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                continue
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():  # Cancelled waiters do not consume a token
+                self.tokens -= 1
+                future.set_result(None)
+
+class OutboundSendScheduler(BaseRequestMiddleware):
+    """Pace every outgoing Telegram message by chat and globally, retrying on retry_after"""
+    
+    def __init__(self):
+        rate = process_send_rate(leader=False)
+        self.global_bucket = PriorityTokenBucket(rate=rate, burst=max(1, int(rate)))
+        self.chat_buckets: OrderedDict = OrderedDict()  # chat_id -> AsyncTokenBucket, in LRU order
+        self.retries = 0
+    
+    @property
+    def queue_depth(self) -> int:
+        return self.global_bucket.queue_depth + sum(b.queue_depth for b in self.chat_buckets.values())
+    
+    def set_leader(self, leader: bool):
+        """Take or give back the leader's share of the bot-wide send rate"""
+        rate = process_send_rate(leader)
+        self.global_bucket.set_rate(rate, max(1, int(rate)))
+        logger.info(f"🚦 Global send rate set to {rate:.2f} msg/s")
+    
+    def chat_bucket(self, chat_id: int) -> AsyncTokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, int) and chat_id > 0:
+                bucket = AsyncTokenBucket(rate=TELEGRAM_PRIVATE_RATE, burst=TELEGRAM_CHAT_BURST)
+            else:
+                bucket = AsyncTokenBucket(rate=TELEGRAM_GROUP_RATE_PER_MIN / 60, burst=TELEGRAM_CHAT_BURST)
+            self.chat_buckets[chat_id] = bucket
+            while len(self.chat_buckets) > TELEGRAM_CHAT_BUCKETS_MAX:
+                oldest_id, oldest = next(iter(self.chat_buckets.items()))
+                if oldest.queue_depth:
+                    break  # Never drop a bucket somebody is waiting on
+                del self.chat_buckets[oldest_id]
+        else:
+            self.chat_buckets.move_to_end(chat_id)
+        return bucket
+    
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method):
+        api_method = getattr(method, "__api_method__", "")
+        chat_id = getattr(method, "chat_id", None)
+        if (chat_id is None or api_method in TELEGRAM_UNLIMITED_METHODS
+                or not api_method.startswith(TELEGRAM_LIMITED_PREFIXES)):
+            return await make_request(bot, method)
+        
+        priority = send_priority.get()
+        for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+            await self.chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire(priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == TELEGRAM_MAX_RETRIES:
+                    raise
+                self.retries += 1
+                logger.warning(f"⏳ Telegram asked to wait {e.retry_after}s before {api_method} to chat {chat_id}")
+                self.chat_bucket(chat_id).penalize(e.retry_after)
+
+outbound_scheduler = OutboundSendScheduler()
+bot.session.middleware(outbound_scheduler)
+bot.session.middleware(TelegramCallMetrics())  # Registered last so it times only the API call itself
+
+# OpenTDB allows about one request per IP every 5 seconds
+OPENTDB_RATE = float(os.getenv("OPENTDB_RATE", "0.2"))
+OPENTDB_BURST = int(os.getenv("OPENTDB_BURST", "1"))
+
+session: aiohttp.ClientSession = None
+opentdb_limiter = AsyncTokenBucket(rate=OPENTDB_RATE, burst=OPENTDB_BURST)  # Shared by all upstream calls
+user_ids: Set[int] = set()
+group_ids: Set[int] = set()
+broadcast_mode: Set[int] = set()
+broadcast_target: dict = {}  # Store broadcast target choice for each owner
+auto_quiz_active_groups: Set[int] = set()  # Groups where auto-quiz is active
+
+# ─── Quiz Throttling ────────────────────────────────────────────────────────
+THROTTLE_USER_RATE = float(os.getenv("THROTTLE_USER_RATE", "0.5"))  # Quizzes per second per user
+THROTTLE_USER_BURST = int(os.getenv("THROTTLE_USER_BURST", "2"))
+THROTTLE_CHAT_RATE = float(os.getenv("THROTTLE_CHAT_RATE_PER_MIN", "20")) / 60  # Quizzes per second per group
+THROTTLE_CHAT_BURST = int(os.getenv("THROTTLE_CHAT_BURST", "5"))
+THROTTLE_STORE_MAX = int(os.getenv("THROTTLE_STORE_MAX", "100000"))  # Buckets kept per store
+THROTTLE_IDLE_SECONDS = 600  # Idle buckets are full again long before this, so they can be dropped
+QUIZ_COMMANDS = set(CATEGORIES) | {"random"}
+
+class TokenBucketStore:
+    """Token buckets keyed by id in an LRU with idle expiry, bounded at `capacity` entries"""
+    
+    def __init__(self, rate: float, burst: int, capacity: int, idle_seconds: float):
+        self.rate = rate
+        self.burst = burst
+        self.capacity = capacity
+        self.idle_seconds = idle_seconds
+        self.buckets: OrderedDict = OrderedDict()  # key -> [tokens, updated_at], least recently used first
+    
+    def __len__(self) -> int:
+        return len(self.buckets)
+    
+    def try_acquire(self, key: int) -> bool:
+        """Take one token for `key` if available, without waiting"""
+        now = time.monotonic()
+        bucket = self.buckets.pop(key, None)
+        if bucket is None:
+            bucket = [float(self.burst), now]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        self.buckets[key] = bucket
+        
+        # Expire from the cold end: each access removes at most the entries that became stale
+        while self.buckets:
+            oldest_key, (_, updated_at) = next(iter(self.buckets.items()))
+            if len(self.buckets) <= self.capacity and now - updated_at < self.idle_seconds:
+                break
+            del self.buckets[oldest_key]
+        
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+class QuizThrottleMiddleware(BaseMiddleware):
+    """Drop quiz commands from users or groups that exceed their token bucket"""
+    
+    def __init__(self):
+        self.users = TokenBucketStore(THROTTLE_USER_RATE, THROTTLE_USER_BURST, THROTTLE_STORE_MAX, THROTTLE_IDLE_SECONDS)
+        self.chats = TokenBucketStore(THROTTLE_CHAT_RATE, THROTTLE_CHAT_BURST, THROTTLE_STORE_MAX, THROTTLE_IDLE_SECONDS)
+        self.in_flight: Set[int] = set()  # Users with a quiz being prepared
+        self.throttled = {"in_flight": 0, "user": 0, "chat": 0}
+    
+    async def __call__(self, handler, event: Message, data: dict):
+        command = data.get("command")
+        if command is None or command.command.lower() not in QUIZ_COMMANDS or not event.from_user:
+            return await handler(event, data)
+        
+        user_id = event.from_user.id
+        if user_id in self.in_flight:
+            scope = "in_flight"
+        elif not self.users.try_acquire(user_id):
+            scope = "user"
+        elif event.chat.type in ("group", "supergroup") and not self.chats.try_acquire(event.chat.id):
+            scope = "chat"
+        else:
+            self.in_flight.add(user_id)
+            try:
+                return await handler(event, data)
+            finally:
+                self.in_flight.discard(user_id)
+        
+        self.throttled[scope] += 1
+        update_logger.info("⏱️ Quiz request from user %s in chat %s throttled (%s)", user_id, event.chat.id, scope)
+        return None
+
+quiz_throttle = QuizThrottleMiddleware()
+dp.message.middleware(quiz_throttle)
 
 logger.info("🔧 Global variables initialized - ready for operations")
 
-async def fetch_quiz(category_id: int):
-    """Fetch quiz question from OpenTDB API with retry logic"""
-    logger.info(f"🎯 Starting quiz fetch for category ID: {category_id}")
-    retries = 2
+OPENTDB_BASE_URL = os.getenv("OPENTDB_BASE_URL", "https://opentdb.com").rstrip("/")
+
+class OpenTDBError(Exception):
+    """Raised when OpenTDB does not return usable questions"""
+
+class OpenTDBNoResults(OpenTDBError):
+    """Raised when OpenTDB has not enough questions for the query"""
+
+class OpenTDBTokenExhausted(OpenTDBError):
+    """Raised when a session token has returned every question of a category"""
+
+class OpenTDBFetcher:
+    """OpenTDB client holding one session token per category to avoid repeats"""
+    RESPONSE_SUCCESS = 0
+    RESPONSE_NO_RESULTS = 1
+    RESPONSE_INVALID_PARAMETER = 2
+    RESPONSE_TOKEN_NOT_FOUND = 3
+    RESPONSE_TOKEN_EMPTY = 4
+    RESPONSE_RATE_LIMIT = 5
+    
+    def __init__(self, base_url: str = OPENTDB_BASE_URL):
+        self.base_url = base_url
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.tokens: Dict[int, str] = {}  # category_id -> session token
+        self.token_tasks: Dict[int, asyncio.Task] = {}  # category_id -> running token request/reset
+        self.exhausted_categories: Set[int] = set()  # Categories whose token ran out at least once
     
-    for attempt in range(retries):
-        logger.info(f"🔄 Attempt {attempt + 1}/{retries} for category {category_id}")
+    def schedule_token_refresh(self, category_id: int, command: str = "request"):
+        """Request or reset the session token of a category in the background"""
+        task = self.token_tasks.get(category_id)
+        if task and not task.done():
+            return
+        self.token_tasks[category_id] = asyncio.create_task(self.refresh_token(category_id, command))
+    
+    async def refresh_token(self, category_id: int, command: str = "request"):
+        """Request a new session token, or reset the current one"""
+        token = self.tokens.get(category_id)
+        params = {"command": "reset", "token": token} if command == "reset" and token else {"command": "request"}
+        
         try:
-            async with semaphore:
-                url = f"https://opentdb.com/api.php?amount=1&type=multiple&category={category_id}"
-                logger.debug(f"🌐 Making HTTP request to: {url}")
+            await opentdb_limiter.acquire()
+            async with self.session.get(
+                f"{self.base_url}/api_token.php", params=params, timeout=aiohttp.ClientTimeout(total=5)
+            ) as resp:
+                data = await resp.json(content_type=None)
+        except Exception as e:
+            logger.warning(f"⚠️ Session token {params['command']} failed for category {category_id}: {str(e)}")
+            return
+        
+        if data.get("response_code") == self.RESPONSE_SUCCESS and data.get("token"):
+            self.tokens[category_id] = data["token"]
+            logger.info(f"🎟️ Session token {params['command']} succeeded for category {category_id}")
+        else:
+            # Unknown token on reset: drop it so the next request asks for a fresh one
+            self.tokens.pop(category_id, None)
+            logger.warning(f"⚠️ Session token {params['command']} rejected for category {category_id}: {data}")
+    
+    async def request_questions(self, category_id: int, amount: int = 1,
+                                allow_repeats: bool = True, use_token: bool = True):
+        """Request raw questions for a category with retry logic"""
+        retries = 2
+        token = self.tokens.get(category_id) if use_token else None
+        if use_token and not token:
+            # Never wait for a token on the hot path, the next request will carry it
+            self.schedule_token_refresh(category_id)
+        
+        params = {"amount": amount, "type": "multiple", "category": category_id}
+        if token:
+            params["token"] = token
+        
+        for attempt in range(retries):
+            update_logger.info("🔄 Attempt %s/%s for category %s (amount=%s)", attempt + 1, retries, category_id, amount)
+            if attempt:
+                opentdb_retries_total.inc()
+            try:
+                await opentdb_limiter.acquire()
+                url = f"{self.base_url}/api.php"
+                logger.debug("🌐 Making HTTP request to: %s %s (queue depth: %s)", url, params, opentdb_limiter.queue_depth)
                 
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as resp:
-                    logger.info(f"📡 API response received: HTTP {resp.status}")
+                started = time.perf_counter()
+                async with self.session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                    opentdb_request_seconds.observe(time.perf_counter() - started, str(resp.status))
+                    update_logger.info("📡 API response received: HTTP %s", resp.status)
                     
                     if resp.status == 429:
                         logger.warning(f"⏳ Rate limit hit for category {category_id}")
+                        opentdb_limiter.penalize(1 / OPENTDB_RATE)
                         if attempt < retries - 1:
-                            logger.info(f"😴 Waiting 3 seconds before retry (attempt {attempt + 1})")
-                            await asyncio.sleep(3)
+                            update_logger.info("😴 Backing off upstream limiter before retry (attempt %s)", attempt + 1)
                             continue
                         logger.error("❌ Rate limit exceeded after all retries")
-                        raise Exception("429 Rate Limited")
+                        raise OpenTDBError("429 Rate Limited")
                     elif resp.status != 200:
                         logger.error(f"❌ HTTP error {resp.status} for category {category_id}")
-                        raise Exception(f"HTTP {resp.status}")
-                    
-                    data = await resp.json()
-                    logger.debug(f"📦 Raw API data received: {data}")
-                    
-                    if not data.get("results"):
-                        logger.error("❌ No quiz results found in API response")
-                        raise Exception("No quiz results returned")
-                    
-                    result = data["results"][0]
-                    logger.info(f"📝 Processing quiz question: {result.get('question', 'Unknown')[:50]}...")
-                    
-                    q = unescape(result["question"])
-                    correct = unescape(result["correct_answer"])
-                    opts = [unescape(x) for x in result["incorrect_answers"]] + [correct]
-                    
-                    logger.info(f"❓ Question: {q}")
-                    logger.info(f"✅ Correct answer: {correct}")
-                    logger.debug(f"🎲 Options before shuffle: {opts}")
-                    
-                    random.shuffle(opts)
-                    correct_index = opts.index(correct)
-                    
-                    logger.info(f"🔀 Options shuffled, correct answer at index: {correct_index}")
-                    logger.info(f"📋 Final options: {opts}")
-                    
-                    return q, opts, correct_index, correct
+                        raise OpenTDBError(f"HTTP {resp.status}")
                     
+                    data = await resp.json(content_type=None)
+                    logger.debug("📦 Raw API data received: %s", data)
+                
+                code = data.get("response_code", self.RESPONSE_SUCCESS)
+                
+                if code == self.RESPONSE_TOKEN_NOT_FOUND and token:
+                    logger.warning(f"🎟️ Session token for category {category_id} not found, requesting a new one")
+                    self.tokens.pop(category_id, None)
+                    self.schedule_token_refresh(category_id)
+                    break
+                
+                if code == self.RESPONSE_TOKEN_EMPTY and token:
+                    update_logger.info("🎟️ Category %s exhausted for its session token, resetting", category_id)
+                    self.exhausted_categories.add(category_id)
+                    self.schedule_token_refresh(category_id, "reset")
+                    if not allow_repeats:
+                        raise OpenTDBTokenExhausted(f"Category {category_id} exhausted")
+                    break
+                
+                if code == self.RESPONSE_RATE_LIMIT:
+                    logger.warning(f"⏳ OpenTDB rate limit code for category {category_id}")
+                    opentdb_limiter.penalize(1 / OPENTDB_RATE)
+                    if attempt < retries - 1:
+                        continue
+                    raise OpenTDBError("OpenTDB rate limited")
+                
+                if code == self.RESPONSE_NO_RESULTS or not data.get("results"):
+                    logger.error("❌ No quiz results found in API response")
+                    raise OpenTDBNoResults("No quiz results returned")
+                
+                if code != self.RESPONSE_SUCCESS:
+                    raise OpenTDBError(f"OpenTDB response code {code}")
+                
+                return data["results"]
+                        
+            except OpenTDBNoResults:
+                raise
+            except OpenTDBTokenExhausted:
+                raise
+            except Exception as e:
+                logger.error(f"💥 Error on attempt {attempt + 1}: {str(e)}")
+                if attempt == retries - 1:
+                    logger.error(f"❌ All retries exhausted for category {category_id}")
+                    raise e
+        
+        # Only reached when the token was unusable. The tokenless request runs outside the retry
+        # loop so that its failure is final instead of sending the stale token again.
+        return await self.request_questions(category_id, amount, allow_repeats, use_token=False)
+
+opentdb = OpenTDBFetcher()
+
+def parse_question(result: dict) -> Tuple[str, str, List[str]]:
+    """Unescape a raw OpenTDB result into (question, correct, incorrect answers)"""
+    q = unescape(result["question"])
+    correct = unescape(result["correct_answer"])
+    incorrect = [unescape(x) for x in result["incorrect_answers"]]
+    return q, correct, incorrect
+
+def build_quiz(question: Tuple[str, str, List[str]]):
+    """Shuffle answer options and return (question, options, correct_index, correct)"""
+    q, correct, incorrect = question
+    opts = incorrect + [correct]
+    logger.debug("🎲 Options before shuffle: %s", opts)
+    
+    random.shuffle(opts)
+    correct_index = opts.index(correct)
+    
+    update_logger.info("🔀 Options shuffled, correct answer at index: %s", correct_index)
+    return q, opts, correct_index, correct
+
+async def fetch_quiz(category_id: int):
+    """Fetch a single quiz question live from OpenTDB API, falling back to the question bank"""
+    update_logger.info("🎯 Starting quiz fetch for category ID: %s", category_id)
+    try:
+        results = await opentdb.request_questions(category_id, amount=1)
+    except Exception as e:
+        banked = await get_bank_questions(category_id)
+        if not banked:
+            raise e
+        logger.warning(f"🏦 OpenTDB unavailable, serving category {category_id} from question bank")
+        return build_quiz(banked[0])
+    
+    result = results[0]
+    logger.debug("📝 Processing quiz question: %s...", result.get('question', 'Unknown')[:50])
+    
+    question = parse_question(result)
+    logger.debug("❓ Question: %s", question[0])
+    logger.debug("✅ Correct answer: %s", question[1])
+    
+    asyncio.create_task(save_questions(category_id, [question]))
+    return build_quiz(question)
+
+# ─── Prefetched Question Pool ───────────────────────────────────────────────
+QUESTION_POOL_BATCH_SIZE = int(os.getenv("QUESTION_POOL_BATCH_SIZE", "50"))
+QUESTION_POOL_LOW_WATER = int(os.getenv("QUESTION_POOL_LOW_WATER", "10"))
+
+question_pools: Dict[int, deque] = {}  # category_id -> deque of parsed questions
+pool_refill_tasks: Dict[int, asyncio.Task] = {}  # category_id -> running refill task
+pool_refill_lock = asyncio.Lock()  # One batch refill in flight at a time
+
+async def refill_question_pool(category_id: int):
+    """Top up the question pool for a category with one batch from OpenTDB"""
+    async with pool_refill_lock:
+        pool = question_pools.setdefault(category_id, deque())
+        if len(pool) >= QUESTION_POOL_LOW_WATER:
+            return
+        
+        # Only the leader spends the shared OpenTDB rate limit, followers refill from the bank
+        amount = QUESTION_POOL_BATCH_SIZE if leader_election.is_leader else 0
+        questions = None
+        while amount >= 1:
+            try:
+                results = await opentdb.request_questions(category_id, amount=amount)
+                questions = [parse_question(result) for result in results]
+                break
+            except OpenTDBNoResults:
+                # Fewer questions left for the category (or token) than requested
+                amount //= 2
+            except Exception as e:
+                logger.warning(f"⚠️ Pool refill failed for category {category_id}: {str(e)}")
+                break
+        
+        if questions:
+            await save_questions(category_id, questions)
+        else:
+            questions = await get_bank_questions(category_id, QUESTION_POOL_BATCH_SIZE)
+            logger.info(f"🏦 Refilling pool for category {category_id} from question bank")
+        
+        known = {question[0] for question in pool}
+        added = 0
+        for question in questions:
+            if question[0] not in known:
+                known.add(question[0])
+                pool.append(question)
+                added += 1
+        
+        logger.info(f"🧺 Pool for category {category_id} refilled with {added} questions (size: {len(pool)})")
+
+def schedule_pool_refill(category_id: int):
+    """Start a background refill for a category unless one is already running"""
+    task = pool_refill_tasks.get(category_id)
+    if task and not task.done():
+        return
+    pool_refill_tasks[category_id] = asyncio.create_task(refill_question_pool(category_id))
+
+async def get_quiz(category_id: int):
+    """Serve a quiz from the prefetched pool, falling back to a live fetch when empty"""
+    started = time.perf_counter()
+    pool = question_pools.get(category_id)
+    
+    if pool:
+        question = pool.popleft()
+        update_logger.info("🧺 Serving question from pool for category %s (%s left)", category_id, len(pool))
+        if len(pool) < QUESTION_POOL_LOW_WATER:
+            schedule_pool_refill(category_id)
+        quiz_fetch_seconds.observe(time.perf_counter() - started, "pool")
+        return build_quiz(question)
+    
+    schedule_pool_refill(category_id)
+    
+    banked = await get_bank_questions(category_id)
+    if banked:
+        update_logger.info("🏦 Pool empty for category %s, serving from question bank", category_id)
+        quiz_fetch_seconds.observe(time.perf_counter() - started, "bank")
+        return build_quiz(banked[0])
+    
+    update_logger.info("📭 Pool and bank empty for category %s, fetching live", category_id)
+    try:
+        return await fetch_quiz(category_id)
+    finally:
+        quiz_fetch_seconds.observe(time.perf_counter() - started, "live")
+
+QUESTION_BANK_HARVEST = os.getenv("QUESTION_BANK_HARVEST", "0") == "1"
+QUESTION_BANK_HARVEST_DELAY = float(os.getenv("QUESTION_BANK_HARVEST_DELAY", "6"))
+QUESTION_BANK_HARVEST_MAX_MISSES = 3  # Batches without new questions before moving on
+
+async def harvest_question_bank():
+    """Bulk-load every category into the question bank (opt-in via QUESTION_BANK_HARVEST=1)"""
+    logger.info(f"🌾 Starting question bank harvest for {len(CATEGORIES)} categories")
+    
+    for cat_id, _, desc in CATEGORIES.values():
+        misses = 0
+        while misses < QUESTION_BANK_HARVEST_MAX_MISSES:
+            await asyncio.sleep(QUESTION_BANK_HARVEST_DELAY)
+            try:
+                results = await opentdb.request_questions(cat_id, amount=QUESTION_POOL_BATCH_SIZE, allow_repeats=False)
+            except OpenTDBTokenExhausted:
+                logger.info(f"🌾 Session token exhausted for {desc}, every question harvested")
+                break
+            except Exception as e:
+                logger.warning(f"⚠️ Harvest request failed for {desc}: {str(e)}")
+                misses += 1
+                continue
+            
+            before = await count_bank_questions(cat_id)
+            await save_questions(cat_id, [parse_question(result) for result in results])
+            after = await count_bank_questions(cat_id)
+            misses = misses + 1 if after == before else 0
+            
+        logger.info(f"🌾 Harvested {desc}: {await count_bank_questions(cat_id)} questions in bank")
+    
+    logger.info("✅ Question bank harvest completed")
+
+async def warm_question_pools():
+    """Fill every category pool in the background after startup"""
+    logger.info(f"🔥 Warming question pools for {len(CATEGORIES)} categories")
+    for cat_id, _, _ in CATEGORIES.values():
+        await refill_question_pool(cat_id)
+    logger.info("✅ Question pools warmed")
+
+# ─── Poll Registry ──────────────────────────────────────────────────────────
+POLL_TTL_SECONDS = int(os.getenv("POLL_TTL_SECONDS", "86400"))
+POLL_REGISTRY_MAX = int(os.getenv("POLL_REGISTRY_MAX", "50000"))
+
+class PollRecord:
+    """Metadata of one sent quiz poll"""
+    __slots__ = ('poll_id', 'question', 'correct_answer', 'options', 'category',
+                 'group_id', 'message_id', 'chat_id', 'timestamp', 'user_id', 'expires_at')
+    
+    def __init__(self, poll_id: str, question: str, correct_answer: str, options: List[str],
+                 category: str, group_id: Optional[int], message_id: int, chat_id: int,
+                 timestamp: float, user_id: Optional[int] = None):
+        self.poll_id = poll_id
+        self.question = question
+        self.correct_answer = correct_answer
+        self.options = options
+        self.category = category
+        self.group_id = group_id
+        self.message_id = message_id
+        self.chat_id = chat_id
+        self.timestamp = timestamp
+        self.user_id = user_id  # Who requested the quiz, None for auto-quiz
+        self.expires_at = 0.0
+
+class PollRegistry:
+    """Active polls keyed by poll_id with TTL eviction and a size cap"""
+    
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.polls: Dict[str, PollRecord] = {}
+        self.expiry_heap: List[Tuple[float, str]] = []  # (expires_at, poll_id), oldest first
+    
+    def __len__(self) -> int:
+        return len(self.polls)
+    
+    def __contains__(self, poll_id: str) -> bool:
+        return self.get(poll_id) is not None
+    
+    def add(self, record: PollRecord):
+        """Register a poll, evicting expired polls and the oldest ones above the cap"""
+        record.expires_at = record.timestamp + self.ttl
+        self.polls[record.poll_id] = record
+        heapq.heappush(self.expiry_heap, (record.expires_at, record.poll_id))
+        self.evict()
+    
+    def get(self, poll_id: str) -> Optional[PollRecord]:
+        record = self.polls.get(poll_id)
+        if record and record.expires_at <= time.time():
+            self.evict()
+            return None
+        return record
+    
+    def evict(self):
+        """Drop expired polls, then the oldest polls while above max_size"""
+        now = time.time()
+        heap = self.expiry_heap
+        while heap and (heap[0][0] <= now or len(self.polls) > self.max_size):
+            expires_at, poll_id = heapq.heappop(heap)
+            record = self.polls.get(poll_id)
+            # Skip stale heap entries of polls that were re-registered
+            if record is None or record.expires_at != expires_at:
+                continue
+            del self.polls[poll_id]
+
+poll_registry = PollRegistry(POLL_TTL_SECONDS, POLL_REGISTRY_MAX)
+
+POLL_FLUSH_INTERVAL_MS = int(os.getenv("POLL_FLUSH_INTERVAL_MS", "200"))
+POLL_CLEANUP_SECONDS = 3600
+
+async def write_poll_batch(batch: List[PollRecord]):
+    """Persist a batch of sent polls to the active_polls table"""
+    async with db_acquire() as connection:
+        await connection.executemany('''
+            INSERT INTO active_polls
+                (poll_id, chat_id, message_id, group_id, user_id, category, question, options, correct_index, created_at)
+            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
+            ON CONFLICT (poll_id) DO NOTHING
+        ''', [
+            (record.poll_id, record.chat_id, record.message_id, record.group_id, record.user_id,
+             record.category, record.question, record.options,
+             record.options.index(record.correct_answer), datetime.fromtimestamp(record.timestamp))
+            for record in batch
+        ])
+    
+    logger.debug(f"💾 Flushed {len(batch)} polls to active_polls")
+
+poll_writer = WriteBehindQueue("polls", write_poll_batch, POLL_FLUSH_INTERVAL_MS, ANSWER_FLUSH_BATCH_SIZE)
+
+def remember_poll(record: PollRecord):
+    """Register a poll in memory and queue it for the shared active_polls table"""
+    poll_registry.add(record)
+    if poll_writer.running:
+        poll_writer.add(record)
+
+async def load_poll(poll_id: str) -> Optional[PollRecord]:
+    """Read a poll from the active_polls table"""
+    if not db_pool:
+        return None
+    
+    async with db_acquire() as connection:
+        row = await connection.fetchrow('''
+            SELECT poll_id, chat_id, message_id, group_id, user_id, category, question, options,
+                   correct_index, created_at
+            FROM active_polls WHERE poll_id = $1
+        ''', poll_id)
+    
+    if not row:
+        return None
+    
+    options = list(row['options'])
+    return PollRecord(
+        poll_id=row['poll_id'],
+        question=row['question'],
+        correct_answer=options[row['correct_index']],
+        options=options,
+        category=row['category'],
+        group_id=row['group_id'],
+        message_id=row['message_id'],
+        chat_id=row['chat_id'],
+        timestamp=row['created_at'].timestamp(),
+        user_id=row['user_id'],
+    )
+
+async def lookup_poll(poll_id: str) -> Optional[PollRecord]:
+    """Find a poll in memory first, then read it through from the active_polls table"""
+    record = poll_registry.get(poll_id)
+    if record:
+        return record
+    
+    try:
+        record = await load_poll(poll_id)
+        if not record:
+            # Another process may not have flushed the poll yet
+            await asyncio.sleep(POLL_FLUSH_INTERVAL_MS / 1000)
+            record = await load_poll(poll_id)
+    except Exception as e:
+        logger.error(f"❌ Failed to load poll {poll_id} from database: {str(e)}")
+        return None
+    
+    if record and record.timestamp + POLL_TTL_SECONDS > time.time():
+        poll_registry.add(record)
+        update_logger.info("📥 Poll %s loaded from database", poll_id)
+        return record
+    return None
+
+async def poll_cleanup_loop():
+    """Delete expired polls from the active_polls table"""
+    while True:
+        await asyncio.sleep(POLL_CLEANUP_SECONDS)
+        try:
+            async with db_acquire() as connection:
+                result = await connection.execute(
+                    "DELETE FROM active_polls WHERE created_at < $1",
+                    datetime.fromtimestamp(time.time() - POLL_TTL_SECONDS),
+                )
+            logger.info(f"🗑️ Expired polls cleaned up: {result}")
         except Exception as e:
-            logger.error(f"💥 Error on attempt {attempt + 1}: {str(e)}")
-            if attempt == retries - 1:
-                logger.error(f"❌ All retries exhausted for category {category_id}")
-                raise e
+            logger.error(f"❌ Poll cleanup failed: {str(e)}")
 
-# Global dictionary to store active polls - FIXED VERSION
-active_polls = {}
+def register_poll(poll_msg: Message, question: str, options: List[str], correct: str,
+                  category: str, group_id: Optional[int], user_id: Optional[int] = None):
+    """Store the metadata of a sent quiz poll under its poll_id"""
+    if not poll_msg.poll:
+        logger.error(f"❌ Sent message {poll_msg.message_id} has no poll, cannot register it")
+        return
+    
+    remember_poll(PollRecord(
+        poll_id=poll_msg.poll.id,
+        question=question,
+        correct_answer=correct,
+        options=options,
+        category=category,
+        group_id=group_id,
+        message_id=poll_msg.message_id,
+        chat_id=poll_msg.chat.id,
+        timestamp=time.time(),
+        user_id=user_id,
+    ))
+    update_logger.info("📝 Poll data stored with poll_id: %s (%s active)", poll_msg.poll.id, len(poll_registry))
 
 async def send_quiz(msg: Message, cat_id: int, emoji: str, category_name: str = None):
-    """Send quiz poll to user with typing indicator and throttling - FIXED VERSION"""
+    """Send quiz poll to user with typing indicator; throttling is done by QuizThrottleMiddleware"""
     info = extract_user_info(msg)
     user_id = info['user_id']
-    current_time = time.time()
     
-    # Check if user is already processing a request
-    if user_id in user_processing:
-        logger.info(f"🚫 User {info['full_name']} already has a request in progress, ignoring")
-        return
-    
-    # Check user cooldown
-    if user_id in user_last_request:
-        time_since_last = current_time - user_last_request[user_id]
-        if time_since_last < USER_COOLDOWN:
-            remaining = USER_COOLDOWN - time_since_last
-            logger.info(f"⏱️ User {info['full_name']} on cooldown, {remaining:.1f}s remaining")
-            return
-    
-    # Mark user as processing and update last request time
-    user_processing.add(user_id)
-    user_last_request[user_id] = current_time
-    
-    logger.info(f"🎯 Sending quiz to user {info['full_name']} for category {cat_id}")
+    update_logger.info("🎯 Sending quiz to user %s for category %s", info['full_name'], cat_id)
     
     # Save user and group to database
     await save_user(user_id, info['username'], info['full_name'])
@@ -553,22 +2372,22 @@ async def send_quiz(msg: Message, cat_id: int, emoji: str, category_name: str =
     if info['chat_type'] in ['group', 'supergroup']:
         group_id = msg.chat.id
         group_ids.add(group_id)
-        auto_quiz_active_groups.add(group_id)  # Activate auto-quiz for this group
+        activate_auto_quiz(group_id)
         await save_group(group_id, info['chat_title'], info['chat_username'])
-        logger.info(f"📢 Group added to database and auto-quiz activated. Total groups: {len(group_ids)}")
+        update_logger.info("📢 Group added to database and auto-quiz activated. Total groups: %s", len(group_ids))
     
     try:
         logger.debug("⌨️ Showing typing indicator to user")
         await bot.send_chat_action(msg.chat.id, ChatAction.TYPING)
         
-        logger.info("📥 Fetching quiz question from API")
-        q, opts, correct_id, correct = await fetch_quiz(cat_id)
+        update_logger.info("📥 Getting quiz question from pool")
+        q, opts, correct_id, correct = await get_quiz(cat_id)
         
-        logger.info(f"📊 Creating poll with question: {q[:50]}...")
+        logger.debug("📊 Creating poll with question: %s...", q[:50])
         
         # Reply to user message in groups, send normally in private chats
         if info['chat_type'] in ['group', 'supergroup']:
-            logger.info(f"📢 Sending quiz as reply in group {info['chat_title']}")
+            update_logger.info("📢 Sending quiz as reply in group %s", info['chat_title'])
             poll_msg = await msg.reply_poll(
                 question=f"{q} {emoji}",
                 options=opts,
@@ -578,7 +2397,7 @@ async def send_quiz(msg: Message, cat_id: int, emoji: str, category_name: str =
                 explanation=f"💡 Correct Answer: {correct}",
             )
         else:
-            logger.info(f"💬 Sending quiz in private chat with {info['full_name']}")
+            update_logger.info("💬 Sending quiz in private chat with %s", info['full_name'])
             poll_msg = await msg.answer_poll(
                 question=f"{q} {emoji}",
                 options=opts,
@@ -587,80 +2406,43 @@ async def send_quiz(msg: Message, cat_id: int, emoji: str, category_name: str =
                 is_anonymous=False,
                 explanation=f"💡 Correct Answer: {correct}",
             )
-        logger.info(f"✅ Quiz poll sent successfully, message ID: {poll_msg.message_id}")
-        
-        # Store poll data using message_id AND poll_id (when available) - FIXED APPROACH
-        poll_data = {
-            'question': q,
-            'correct_answer': correct,
-            'options': opts,
-            'category': category_name or 'Unknown',
-            'group_id': group_id,
-            'message_id': poll_msg.message_id,
-            'chat_id': msg.chat.id,
-            'timestamp': time.time(),
-            'user_id': user_id  # Track who requested the quiz
-        }
+        update_logger.info("✅ Quiz poll sent successfully, message ID: %s", poll_msg.message_id)
         
-        # Store by message_id for immediate access
-        active_polls[f"msg_{poll_msg.message_id}"] = poll_data
-        
-        # If poll object is available, also store by poll_id
-        if hasattr(poll_msg, 'poll') and poll_msg.poll and poll_msg.poll.id:
-            active_polls[poll_msg.poll.id] = poll_data
-            logger.info(f"📝 Poll data stored with poll_id: {poll_msg.poll.id}")
-        
-        logger.info(f"📝 Poll data stored with message_id: {poll_msg.message_id}")
+        register_poll(poll_msg, q, opts, correct, category_name or 'Unknown', group_id, user_id)
         
     except Exception as e:
         logger.error(f"💥 Error sending quiz: {str(e)}")
         logger.exception("Full traceback:")
-        
-    finally:
-        # Always remove user from processing set
-        user_processing.discard(user_id)
+
+@dp.my_chat_member()
+async def handle_bot_membership(update: types.ChatMemberUpdated):
+    """Lift the auto-quiz tombstone when the bot is added back to a group"""
+    if update.chat.type not in ("group", "supergroup"):
+        return
+    if update.new_chat_member.status not in ("member", "administrator"):
+        return
+    
+    try:
+        group_ids.add(update.chat.id)
+        await restore_auto_quiz(update.chat.id)
+        logger.info(f"➕ Bot added to group {update.chat.id}, auto-quiz restored")
+    except Exception as e:
+        logger.error(f"❌ Failed to restore auto-quiz in group {update.chat.id}: {str(e)}")
 
 @dp.poll()
 async def handle_poll_update(poll: types.Poll):
-    """Handle poll updates to ensure poll data is accessible by poll_id - FIXED VERSION"""
+    """Handle poll updates to ensure poll data is accessible by poll_id"""
     try:
-        logger.info(f"📊 Poll update received - ID: {poll.id}, Question: {poll.question[:50]}...")
-        
-        # Look for poll data by trying different keys
-        poll_data = None
-        found_key = None
+        logger.debug("📊 Poll update received - ID: %s, Question: %s...", poll.id, poll.question[:50])
         
-        # First, check if we already have it by poll_id
-        if poll.id in active_polls:
-            logger.info(f"✅ Poll data already exists for poll_id: {poll.id}")
-            return
-        
-        # Look through message-based keys to find matching poll
-        for key, data in list(active_polls.items()):
-            if key.startswith("msg_"):
-                # Check if this poll belongs to this message by comparing question
-                stored_question = data['question']
-                poll_question = poll.question
-                
-                # Remove emojis for comparison
-                emoji_chars = "🧠🎵🏅📜🎮🌿💻➗⚡🌍🏛️🎨⭐🐾🚗💥📱🀄🎪🎬📺🎭🎲📚"
-                clean_poll_q = poll_question.rstrip(' ' + emoji_chars).strip()
-                
-                if stored_question == clean_poll_q:
-                    poll_data = data.copy()
-                    found_key = key
-                    break
-        
-        if poll_data:
-            # Store the poll data with the actual poll_id
-            active_polls[poll.id] = poll_data
-            logger.info(f"✅ Poll data mapped to poll_id: {poll.id}")
-            
-            # Keep the message-based key as backup
-            logger.debug(f"🔄 Keeping backup key: {found_key}")
+        # Polls are registered by id when sent; copying another poll's metadata by question text
+        # would attribute it to the wrong chat, since auto-quiz sends one question to many groups.
+        # Only the answer handler reads polls through from the database: state updates arrive for
+        # every vote, including votes on long-expired polls.
+        if poll.id in poll_registry:
+            logger.debug("✅ Poll data already exists for poll_id: %s", poll.id)
         else:
-            logger.warning(f"⚠️ No matching poll data found for poll_id: {poll.id}")
-            logger.debug(f"🔍 Available keys: {list(active_polls.keys())}")
+            logger.debug("🤷 Poll %s is not in memory - it is loaded when an answer needs it", poll.id)
         
     except Exception as e:
         logger.error(f"❌ Error handling poll update: {str(e)}")
@@ -668,206 +2450,680 @@ async def handle_poll_update(poll: types.Poll):
 
 @dp.poll_answer()
 async def handle_poll_answer(poll_answer):
-    """Handle poll answers to track user statistics - FIXED VERSION"""
+    """Handle poll answers to track user statistics"""
     try:
-        logger.info(f"📊 Poll answer received from user {poll_answer.user.full_name} (ID: {poll_answer.user.id})")
-        logger.info(f"🔍 Looking for Poll ID: {poll_answer.poll_id}")
+        update_logger.info("📊 Poll answer received from user %s (ID: %s)", poll_answer.user.full_name, poll_answer.user.id)
+        
+        poll_data = await lookup_poll(poll_answer.poll_id)
+        
+        if not poll_data:
+            logger.error(f"❌ Could not find poll data for poll_id: {poll_answer.poll_id} ({len(poll_registry)} active polls)")
+            
+            # Still save the user to database
+            await save_user(poll_answer.user.id, poll_answer.user.username, poll_answer.user.full_name)
+            return
+            
+        user_id = poll_answer.user.id
+        user_answer_index = poll_answer.option_ids[0] if poll_answer.option_ids else -1
+        
+        if user_answer_index == -1:
+            logger.warning(f"⚠️ No answer option selected by user {poll_answer.user.full_name}")
+            return
+            
+        user_answer = poll_data.options[user_answer_index]
+        correct_answer = poll_data.correct_answer
+        is_correct = user_answer == correct_answer
+        
+        logger.debug("🎯 User answer: '%s' | Correct: '%s' | Result: %s",
+                     user_answer, correct_answer, '✅ Correct' if is_correct else '❌ Wrong')
+        
+        # Profile writes are coalesced, so this is usually a cache hit
+        await save_user(user_id, poll_answer.user.username, poll_answer.user.full_name)
+        
+        # Record the answer in database
+        await record_quiz_answer(
+            user_id=user_id,
+            group_id=poll_data.group_id,
+            category=poll_data.category,
+            question=poll_data.question,
+            user_answer=user_answer,
+            correct_answer=correct_answer,
+            is_correct=is_correct
+        )
         
-        poll_data = None
+        update_logger.info("✅ Poll answer successfully recorded: %s - %s",
+                           poll_answer.user.full_name, '✅ Correct' if is_correct else '❌ Wrong')
+        update_logger.info("📍 Answer location: %s chat",
+                           'Group ' + str(poll_data.group_id) if poll_data.group_id else 'Private')
         
-        # Try to find poll data by poll_id first
-        if poll_answer.poll_id in active_polls:
-            poll_data = active_polls[poll_answer.poll_id]
-            logger.info("✅ Found poll data using poll_id")
+    except Exception as e:
+        logger.error(f"❌ Error handling poll answer: {str(e)}")
+        logger.exception("Full traceback:")
+
+# ─── Auto-Quiz Fan-Out ──────────────────────────────────────────────────────
+AUTO_QUIZ_CONCURRENCY = int(os.getenv("AUTO_QUIZ_CONCURRENCY", "20"))
+
+auto_quiz_last_cycle: dict = {}  # Stats of the last fan-out cycle
+
+async def send_auto_quiz(group_id: int, quiz: tuple, emoji: str, desc: str):
+    """Send one auto-quiz poll to a group; pacing and retries happen in the outbound scheduler"""
+    q, opts, correct_id, correct = quiz
+    poll_msg = await bot.send_poll(
+        chat_id=group_id,
+        question=f"{q} {emoji}",
+        options=opts,
+        type="quiz",
+        correct_option_id=correct_id,
+        is_anonymous=False,
+        explanation=f"💡 Correct Answer: {correct}",
+    )
+    register_poll(poll_msg, q, opts, correct, desc, group_id)
+
+# BadRequest descriptions that mean the chat is gone rather than the message being refused
+CHAT_GONE_ERRORS = ("chat not found", "group chat was deactivated", "group chat was upgraded")
+
+def is_chat_gone(error: TelegramBadRequest) -> bool:
+    return any(reason in error.message.lower() for reason in CHAT_GONE_ERRORS)
+
+async def fan_out_auto_quiz(target_groups: List[int], cat_id: int, emoji: str, desc: str) -> dict:
+    """Send one shared question to many groups concurrently within Telegram rate limits"""
+    started = time.monotonic()
+    send_priority.set(PRIORITY_AUTO_QUIZ)
+    quiz = await get_quiz(cat_id)
+    concurrency = asyncio.Semaphore(AUTO_QUIZ_CONCURRENCY)
+    failures: Dict[int, str] = {}
+    sent: List[int] = []
+    gone: List[int] = []
+    rejected: List[str] = []  # Set once Telegram refuses the shared question itself
+    
+    async def send_to_group(group_id: int):
+        async with concurrency:
+            if rejected:
+                return
+            try:
+                await send_auto_quiz(group_id, quiz, emoji, desc)
+                sent.append(group_id)
+            except TelegramForbiddenError as e:
+                # Bot was removed from the group, stop sending auto-quizzes there
+                failures[group_id] = str(e)
+                gone.append(group_id)
+            except TelegramBadRequest as e:
+                failures[group_id] = str(e)
+                if is_chat_gone(e):
+                    gone.append(group_id)
+                elif not rejected:
+                    # Every group gets the same question, so the rest would be refused as well
+                    rejected.append(str(e))
+            except Exception as e:
+                failures[group_id] = str(e)
+    
+    await asyncio.gather(*(send_to_group(group_id) for group_id in target_groups))
+    
+    if gone:
+        try:
+            await disable_auto_quiz_groups(gone)
+        except Exception as e:
+            logger.error(f"❌ Failed to disable auto-quiz in {len(gone)} gone groups: {str(e)}")
+    
+    if rejected:
+        logger.error(f"❌ Auto-quiz question for {desc} rejected by Telegram, skipped it: {rejected[0]}")
+    
+    stats = {
+        "groups": len(target_groups),
+        "sent": len(sent),
+        "failed": len(failures),
+        "skipped": len(target_groups) - len(sent) - len(failures),
+        "duration": round(time.monotonic() - started, 2),
+        "category": desc,
+    }
+    logger.info(f"📤 Auto-quiz fan-out done: {stats['sent']}/{stats['groups']} sent, "
+                f"{stats['failed']} failed, {stats['skipped']} skipped in {stats['duration']}s")
+    for group_id, error in list(failures.items())[:20]:
+        logger.warning(f"⚠️ Failed to send quiz to group {group_id}: {error}")
+    return stats
+
+# ─── Auto-Quiz Scheduler ────────────────────────────────────────────────────
+AUTO_QUIZ_INTERVAL = int(os.getenv("AUTO_QUIZ_INTERVAL", "7200"))  # Default seconds between quizzes per group
+AUTO_QUIZ_MIN_INTERVAL = 600
+AUTO_QUIZ_JITTER = float(os.getenv("AUTO_QUIZ_JITTER", "0.1"))  # +/- fraction of the interval
+AUTO_QUIZ_CATCHUP_SECONDS = 600  # Spread quizzes missed while offline over this window
+AUTO_QUIZ_BATCH_WINDOW = 5  # Groups due within this many seconds share one question per category
+AUTO_QUIZ_SYNC_SECONDS = 60  # How often the leader picks up groups activated or configured elsewhere
+
+async def write_schedule_batch(batch: List[tuple]):
+    """Persist next auto-quiz times, keeping the latest time per group"""
+    latest = dict(batch)
+    group_keys = sorted(latest)
+    async with db_acquire() as connection:
+        await connection.execute('''
+            UPDATE groups AS g
+            SET next_quiz_at = d.next_quiz_at
+            FROM unnest($1::bigint[], $2::timestamp[]) AS d(group_id, next_quiz_at)
+            WHERE g.group_id = d.group_id
+        ''', group_keys, [latest[k] for k in group_keys])
+
+schedule_writer = WriteBehindQueue("auto-quiz schedules", write_schedule_batch, 5000, 500)
+
+async def save_auto_quiz_settings(group_id: int, interval: int, categories: Optional[List[str]]):
+    """Save the auto-quiz interval and category set of a group"""
+    if not db_pool:
+        return
+    
+    # Upsert: the group row may still be waiting in the profile write-behind queue
+    async with db_acquire() as connection:
+        await connection.execute('''
+            INSERT INTO groups (group_id, group_title, group_username, auto_quiz_interval, auto_quiz_categories)
+            VALUES ($1, '', '', $2, $3)
+            ON CONFLICT (group_id)
+            DO UPDATE SET auto_quiz_interval = $2, auto_quiz_categories = $3, auto_quiz_disabled_at = NULL
+        ''', group_id, interval, ",".join(categories) if categories else None)
+
+class AutoQuizScheduler:
+    """Heap scheduler giving every group its own jittered auto-quiz time"""
+    
+    def __init__(self):
+        self.heap: List[Tuple[float, int]] = []  # (fire_at, group_id), stale entries skipped lazily
+        self.fire_at: Dict[int, float] = {}  # group_id -> current fire time
+        self.settings: Dict[int, Tuple[int, Optional[List[str]]]] = {}  # group_id -> (interval, categories)
+        self.disabled: Set[int] = set()  # Groups the bot was removed from, until it is added back
+        self.wakeup = asyncio.Event()
+    
+    def __len__(self) -> int:
+        return len(self.fire_at)
+    
+    def interval(self, group_id: int) -> int:
+        return self.settings.get(group_id, (AUTO_QUIZ_INTERVAL, None))[0]
+    
+    def schedule(self, group_id: int, fire_at: float, persist: bool = True):
+        """Set the next fire time of a group"""
+        self.fire_at[group_id] = fire_at
+        heapq.heappush(self.heap, (fire_at, group_id))
+        if persist and schedule_writer.running:
+            schedule_writer.add((group_id, datetime.fromtimestamp(fire_at)))
+        if self.heap[0][1] == group_id:
+            self.wakeup.set()
+    
+    def add_group(self, group_id: int):
+        """Schedule a newly active group at a random point of its interval"""
+        interval = self.interval(group_id)
+        if group_id in self.fire_at or interval <= 0:
+            return
+        self.schedule(group_id, time.time() + random.uniform(0, interval))
+    
+    def configure(self, group_id: int, interval: int, categories: Optional[List[str]]):
+        """Apply new settings to a group and reschedule it"""
+        self.settings[group_id] = (interval, categories)
+        self.fire_at.pop(group_id, None)
+        self.disabled.discard(group_id)
+        if interval > 0:
+            auto_quiz_active_groups.add(group_id)
+            self.add_group(group_id)
         else:
-            # Fallback: Look through all stored poll data
-            logger.warning(f"⚠️ Poll_id {poll_answer.poll_id} not found, searching all poll data...")
+            auto_quiz_active_groups.discard(group_id)
+    
+    async def load(self):
+        """Reload settings and next fire times of every group from the database"""
+        await self.sync(full=True)
+    
+    async def sync(self, full: bool = False):
+        """Apply group settings from the database; without `full`, known groups keep their fire times"""
+        async with db_acquire() as connection:
+            rows = await connection.fetch('''
+                SELECT group_id, auto_quiz_interval, auto_quiz_categories, next_quiz_at, auto_quiz_disabled_at
+                FROM groups
+            ''')
+        
+        now = time.time()
+        if full:
+            self.heap.clear()
+            self.fire_at.clear()
+            auto_quiz_active_groups.clear()
+        for row in rows:
+            interval = row['auto_quiz_interval'] if row['auto_quiz_interval'] is not None else AUTO_QUIZ_INTERVAL
+            categories = row['auto_quiz_categories'].split(",") if row['auto_quiz_categories'] else None
+            self.settings[row['group_id']] = (interval, categories)
+            if row['auto_quiz_disabled_at'] is not None:
+                self.disabled.add(row['group_id'])
+            else:
+                self.disabled.discard(row['group_id'])
+            if interval <= 0 or row['group_id'] in self.disabled:
+                auto_quiz_active_groups.discard(row['group_id'])
+                self.fire_at.pop(row['group_id'], None)
+                continue
             
-            current_time = time.time()
-            for key, data in list(active_polls.items()):
-                # Only check recent polls (within last 10 minutes)
-                if current_time - data.get('timestamp', 0) < 600:
-                    # For debugging, let's try to match this poll
-                    logger.debug(f"🔍 Checking poll data: {key} (age: {current_time - data.get('timestamp', 0):.1f}s)")
-                    
-                    # Since we can't easily match, let's use the most recent one as fallback
-                    if not poll_data or data.get('timestamp', 0) > poll_data.get('timestamp', 0):
-                        poll_data = data
-                        logger.debug(f"🎯 Using poll data from key: {key}")
+            auto_quiz_active_groups.add(row['group_id'])
+            if row['group_id'] in self.fire_at:
+                continue
+            next_quiz_at = row['next_quiz_at'].timestamp() if row['next_quiz_at'] else None
+            if next_quiz_at is None:
+                next_quiz_at = now + random.uniform(0, interval)
+            elif next_quiz_at < now:
+                next_quiz_at = now + random.uniform(0, AUTO_QUIZ_CATCHUP_SECONDS)
+            self.schedule(row['group_id'], next_quiz_at, persist=False)
+        
+        if full:
+            logger.info(f"🗓️ Auto-quiz schedule loaded for {len(self.fire_at)} groups")
+    
+    def pop_due(self, until: float) -> List[int]:
+        """Pop every group due before `until`"""
+        due = []
+        while self.heap and self.heap[0][0] <= until:
+            fire_at, group_id = heapq.heappop(self.heap)
+            if self.fire_at.get(group_id) != fire_at:
+                continue
+            if group_id not in auto_quiz_active_groups:
+                del self.fire_at[group_id]
+                continue
+            due.append(group_id)
+        return due
+    
+    def pick_category(self, group_id: int) -> str:
+        categories = self.settings.get(group_id, (AUTO_QUIZ_INTERVAL, None))[1]
+        choices = [c for c in (categories or []) if c in CATEGORIES] or list(CATEGORIES)
+        return random.choice(choices)
+    
+    async def fire(self, due: List[int]):
+        """Send quizzes to due groups, one shared question per category, and reschedule them"""
+        now = time.time()
+        by_category: Dict[str, List[int]] = {}
+        for group_id in due:
+            by_category.setdefault(self.pick_category(group_id), []).append(group_id)
+            interval = self.interval(group_id)
+            self.schedule(group_id, now + interval * random.uniform(1 - AUTO_QUIZ_JITTER, 1 + AUTO_QUIZ_JITTER))
+        
+        for category, group_list in by_category.items():
+            cat_id, emoji, desc = CATEGORIES[category]
+            try:
+                auto_quiz_last_cycle.update(await fan_out_auto_quiz(group_list, cat_id, emoji, desc))
+            except Exception as e:
+                logger.error(f"💥 Auto-quiz fan-out failed for {desc}: {str(e)}")
+    
+    async def run(self):
+        """Fire groups as they become due"""
+        logger.info("⏰ Auto-quiz scheduler started")
+        while True:
+            try:
+                self.wakeup.clear()
+                timeout = self.heap[0][0] - time.time() if self.heap else None
+                if timeout is None or timeout > 0:
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                
+                due = self.pop_due(time.time() + AUTO_QUIZ_BATCH_WINDOW)
+                if due:
+                    logger.info(f"⏰ {len(due)} groups due for auto-quiz")
+                    asyncio.create_task(self.fire(due))
+            
+            except Exception as err:
+                logger.error(f"💥 Error in auto-quiz scheduler: {str(err)}")
+                await asyncio.sleep(1)
+
+auto_quiz_scheduler = AutoQuizScheduler()
+
+async def run_auto_quiz_scheduler():
+    """Leader job: fire auto-quizzes and pick up groups and settings changed by other instances"""
+    schedule_writer.start()
+    run_task: Optional[asyncio.Task] = None
+    try:
+        while True:
+            try:
+                if run_task is None:
+                    # A failed initial load is retried on the next round instead of ending the job
+                    await auto_quiz_scheduler.load()
+                    run_task = asyncio.create_task(auto_quiz_scheduler.run())
+                else:
+                    await auto_quiz_scheduler.sync()
+            except Exception as e:
+                logger.error(f"❌ Auto-quiz schedule sync failed: {str(e)}")
+            await asyncio.sleep(AUTO_QUIZ_SYNC_SECONDS)
+    finally:
+        if run_task:
+            run_task.cancel()
+        await schedule_writer.stop()
+
+def activate_auto_quiz(group_id: int):
+    """Activate auto-quiz for a group unless its admins turned it off or the bot was removed"""
+    if auto_quiz_scheduler.interval(group_id) <= 0 or group_id in auto_quiz_scheduler.disabled:
+        return
+    auto_quiz_active_groups.add(group_id)
+    auto_quiz_scheduler.add_group(group_id)
+
+async def disable_auto_quiz_groups(group_list: List[int]):
+    """Stop auto-quizzes in groups the bot can no longer post to, persisted so syncs keep them off"""
+    for group_id in group_list:
+        auto_quiz_active_groups.discard(group_id)
+        auto_quiz_scheduler.disabled.add(group_id)
+    
+    async with db_acquire() as connection:
+        await connection.execute('''
+            UPDATE groups SET auto_quiz_disabled_at = CURRENT_TIMESTAMP
+            WHERE group_id = ANY($1::bigint[])
+        ''', group_list)
+    logger.info(f"🚫 Auto-quiz disabled in {len(group_list)} groups the bot was removed from")
+
+async def restore_auto_quiz(group_id: int):
+    """Resume auto-quizzes in a group the bot was added back to"""
+    auto_quiz_scheduler.disabled.discard(group_id)
+    if db_pool:
+        async with db_acquire() as connection:
+            await connection.execute('''
+                UPDATE groups SET auto_quiz_disabled_at = NULL
+                WHERE group_id = $1 AND auto_quiz_disabled_at IS NOT NULL
+            ''', group_id)
+    activate_auto_quiz(group_id)
+
+# ─── Broadcast Jobs ─────────────────────────────────────────────────────────
+BROADCAST_WORKERS = int(os.getenv("BROADCAST_WORKERS", "10"))
+BROADCAST_CHUNK_SIZE = 200  # Targets sent between two checkpoints
+BROADCAST_MAX_RETRIES = 3
+BROADCAST_PROGRESS_SECONDS = 5  # Minimum delay between two progress edits
+BROADCAST_WATCH_SECONDS = 5  # How often the leader looks for jobs started on other instances
+
+def broadcast_keyboard(job_id: int, status: str) -> Optional[InlineKeyboardMarkup]:
+    """Build the pause/resume/cancel buttons for a job"""
+    if status == "running":
+        buttons = [InlineKeyboardButton(text="⏸️ Pause", callback_data=f"bjob_pause_{job_id}")]
+    elif status == "paused":
+        buttons = [InlineKeyboardButton(text="▶️ Resume", callback_data=f"bjob_resume_{job_id}")]
+    else:
+        return None
+    buttons.append(InlineKeyboardButton(text="🛑 Cancel", callback_data=f"bjob_cancel_{job_id}"))
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+def broadcast_progress_text(job) -> str:
+    """Render the progress message of a job"""
+    done = job['sent'] + job['failed']
+    percent = done * 100 // job['total'] if job['total'] else 100
+    status_labels = {
+        "running": "🚀 Running",
+        "paused": "⏸️ Paused",
+        "cancelled": "🛑 Cancelled",
+        "done": "✅ Complete",
+    }
+    return (
+        f"📣 <b>Broadcast #{job['job_id']}</b>\n\n"
+        f"🎯 <b>Target:</b> {job['target_type'].capitalize()}\n"
+        f"📊 <b>Status:</b> {status_labels.get(job['status'], job['status'])}\n"
+        f"📈 <b>Progress:</b> {done}/{job['total']} ({percent}%)\n"
+        f"✅ <b>Sent:</b> {job['sent']}\n"
+        f"❌ <b>Failed:</b> {job['failed']}"
+    )
+
+class BroadcastEngine:
+    """Run persisted broadcast jobs with a rate-limited worker pool and checkpoints"""
+    
+    def __init__(self):
+        self.tasks: Dict[int, asyncio.Task] = {}  # job_id -> runner task
+        self.stop_requests: Dict[int, str] = {}  # job_id -> 'paused' or 'cancelled'
+        self.progress_edited_at: Dict[int, float] = {}
+    
+    async def create_job(self, owner_id: int, target_type: str, msg: Message) -> int:
+        """Persist a job and snapshot its targets, returning the job id"""
+        forward = bool(msg.forward_from or msg.forward_from_chat)
+        target_sql = "SELECT user_id FROM users" if target_type == "users" else "SELECT group_id FROM groups"
+        async with db_acquire() as connection:
+            async with connection.transaction():
+                job_id = await connection.fetchval('''
+                    INSERT INTO broadcast_jobs (owner_id, target_type, from_chat_id, message_id, forward)
+                    VALUES ($1, $2, $3, $4, $5)
+                    RETURNING job_id
+                ''', owner_id, target_type, msg.chat.id, msg.message_id, forward)
+                await connection.execute(
+                    f"INSERT INTO broadcast_targets (job_id, target_id) SELECT $1, t.id FROM ({target_sql}) AS t(id)",
+                    job_id, timeout=DB_BULK_TIMEOUT
+                )
+                await connection.execute('''
+                    UPDATE broadcast_jobs
+                    SET total = (SELECT COUNT(*) FROM broadcast_targets WHERE job_id = $1)
+                    WHERE job_id = $1
+                ''', job_id, timeout=DB_BULK_TIMEOUT)
+        return job_id
+    
+    async def get_job(self, job_id: int):
+        async with db_acquire() as connection:
+            return await connection.fetchrow("SELECT * FROM broadcast_jobs WHERE job_id = $1", job_id)
+    
+    async def set_status(self, job_id: int, status: str):
+        async with db_acquire() as connection:
+            await connection.execute('''
+                UPDATE broadcast_jobs
+                SET status = $2,
+                    finished_at = CASE WHEN $2 IN ('done', 'cancelled') THEN CURRENT_TIMESTAMP END
+                WHERE job_id = $1
+            ''', job_id, status)
+    
+    def start(self, job_id: int):
+        """Start the runner of a job unless it is already running; only the leader sends broadcasts"""
+        # A pause or cancel not yet picked up by a live runner is overridden by this start
+        self.stop_requests.pop(job_id, None)
+        if not leader_election.is_leader:
+            return  # The leader picks 'running' jobs up from the database
+        if job_id in self.tasks and not self.tasks[job_id].done():
+            return
+        self.tasks[job_id] = asyncio.create_task(self.run_job(job_id))
+    
+    def request_stop(self, job_id: int, status: str) -> bool:
+        """Ask a running job to stop at its next checkpoint"""
+        task = self.tasks.get(job_id)
+        if not task or task.done():
+            return False
+        self.stop_requests[job_id] = status
+        return True
+    
+    async def resume_running(self):
+        """Start every job marked running that has no runner in this process"""
+        async with db_acquire() as connection:
+            rows = await connection.fetch("SELECT job_id FROM broadcast_jobs WHERE status = 'running'")
+        for row in rows:
+            if row['job_id'] not in self.tasks:
+                logger.info(f"🔁 Resuming broadcast job #{row['job_id']}")
+                self.start(row['job_id'])
+    
+    async def watch(self):
+        """Leader job: run jobs created or resumed on any instance"""
+        try:
+            while True:
+                try:
+                    await self.resume_running()
+                except Exception as e:
+                    logger.error(f"❌ Failed to check for broadcast jobs: {str(e)}")
+                await asyncio.sleep(BROADCAST_WATCH_SECONDS)
+        finally:
+            await self.stop()
+    
+    async def send_one(self, job, target_id: int) -> Optional[str]:
+        """Deliver the job message to one target, returning an error or None"""
+        for attempt in range(BROADCAST_MAX_RETRIES):
+            try:
+                if job['forward']:
+                    await bot.forward_message(chat_id=target_id, from_chat_id=job['from_chat_id'],
+                                              message_id=job['message_id'])
                 else:
-                    # Clean up old poll data
-                    logger.debug(f"🗑️ Removing old poll data: {key}")
-                    del active_polls[key]
+                    await bot.copy_message(chat_id=target_id, from_chat_id=job['from_chat_id'],
+                                           message_id=job['message_id'])
+                return None
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                return str(e)  # Blocked, kicked or deleted chats will not recover
+            except Exception as e:
+                if attempt == BROADCAST_MAX_RETRIES - 1:
+                    return str(e)
+                await asyncio.sleep(2 ** attempt)
+        return "retries exhausted"
+    
+    async def send_chunk(self, job, target_keys: List[int]) -> List[Tuple[int, Optional[str]]]:
+        """Send one chunk of targets through the worker pool"""
+        queue: asyncio.Queue = asyncio.Queue()
+        for target_id in target_keys:
+            queue.put_nowait(target_id)
+        results = []
         
-        if not poll_data:
-            logger.error(f"❌ Could not find poll data for poll_id: {poll_answer.poll_id}")
-            logger.error(f"📋 Available active poll keys: {list(active_polls.keys())}")
-            
-            # Still save the user to database
-            await save_user(poll_answer.user.id, poll_answer.user.username, poll_answer.user.full_name)
-            return
-            
-        user_id = poll_answer.user.id
-        user_answer_index = poll_answer.option_ids[0] if poll_answer.option_ids else -1
+        async def worker():
+            while not queue.empty():
+                target_id = queue.get_nowait()
+                results.append((target_id, await self.send_one(job, target_id)))
         
-        if user_answer_index == -1:
-            logger.warning(f"⚠️ No answer option selected by user {poll_answer.user.full_name}")
+        await asyncio.gather(*(worker() for _ in range(min(BROADCAST_WORKERS, len(target_keys)))))
+        return results
+    
+    async def checkpoint(self, job_id: int, results: List[Tuple[int, Optional[str]]]):
+        """Record delivered targets and bump the job counters"""
+        target_keys = [target_id for target_id, _ in results]
+        statuses = ["failed" if error else "sent" for _, error in results]
+        errors = [error[:500] if error else None for _, error in results]
+        async with db_acquire() as connection:
+            async with connection.transaction():
+                await connection.execute('''
+                    UPDATE broadcast_targets AS t
+                    SET status = d.status, error = d.error
+                    FROM unnest($2::bigint[], $3::varchar[], $4::text[]) AS d(target_id, status, error)
+                    WHERE t.job_id = $1 AND t.target_id = d.target_id
+                ''', job_id, target_keys, statuses, errors)
+                return await connection.fetchrow('''
+                    UPDATE broadcast_jobs
+                    SET sent = sent + $2, failed = failed + $3
+                    WHERE job_id = $1
+                    RETURNING *
+                ''', job_id, statuses.count("sent"), statuses.count("failed"))
+    
+    async def show_progress(self, job, force: bool = False):
+        """Edit the owner's progress message, at most every few seconds unless forced"""
+        if not job['progress_message_id']:
             return
-            
-        user_answer = poll_data['options'][user_answer_index]
-        correct_answer = poll_data['correct_answer']
-        is_correct = user_answer == correct_answer
-        
-        logger.info(f"🎯 User answer: '{user_answer}' | Correct: '{correct_answer}' | Result: {'✅ Correct' if is_correct else '❌ Wrong'}")
-        
-        # Record the answer in database
-        await record_quiz_answer(
-            user_id=user_id,
-            group_id=poll_data.get('group_id'),
-            category=poll_data['category'],
-            question=poll_data['question'],
-            user_answer=user_answer,
-            correct_answer=correct_answer,
-            is_correct=is_correct
-        )
-        
-        # Always save user info
-        await save_user(user_id, poll_answer.user.username, poll_answer.user.full_name)
-        
-        logger.info(f"✅ Poll answer successfully recorded: {poll_answer.user.full_name} - {'✅ Correct' if is_correct else '❌ Wrong'}")
-        logger.info(f"📍 Answer location: {'Group ' + str(poll_data.get('group_id')) if poll_data.get('group_id') else 'Private'} chat")
-        
-        # Verify the data was saved by checking recent quiz stats - FOR DEBUGGING
+        now = time.monotonic()
+        if not force and now - self.progress_edited_at.get(job['job_id'], 0) < BROADCAST_PROGRESS_SECONDS:
+            return
+        self.progress_edited_at[job['job_id']] = now
         try:
-            async with db_pool.acquire() as connection:
-                recent_quiz = await connection.fetchrow('''
-                    SELECT * FROM quiz_stats 
-                    WHERE user_id = $1 
-                    ORDER BY answered_at DESC 
-                    LIMIT 1
-                ''', user_id)
-                
-                if recent_quiz:
-                    logger.info(f"✅ VERIFIED: Quiz answer saved to database: {recent_quiz['is_correct']}")
-                else:
-                    logger.error(f"❌ CRITICAL: Quiz answer NOT found in database for user {user_id}")
-                    
+            await bot.edit_message_text(
+                broadcast_progress_text(job),
+                chat_id=job['progress_chat_id'],
+                message_id=job['progress_message_id'],
+                reply_markup=broadcast_keyboard(job['job_id'], job['status'])
+            )
+        except TelegramBadRequest as e:
+            logger.debug(f"Progress edit skipped for broadcast #{job['job_id']}: {str(e)}")
         except Exception as e:
-            logger.error(f"❌ Database verification failed: {e}")
-        
-    except Exception as e:
-        logger.error(f"❌ Error handling poll answer: {str(e)}")
-        logger.exception("Full traceback:")
-
-async def auto_quiz_loop():
-    """Send automatic quizzes to active groups every 2 hours - FIXED VERSION"""
-    await bot.wait_until_ready() if hasattr(bot, "wait_until_ready") else asyncio.sleep(2)
+            logger.warning(f"⚠️ Failed to update progress of broadcast #{job['job_id']}: {str(e)}")
     
-    while True:
+    async def run_job(self, job_id: int):
+        """Send a job's pending targets chunk by chunk until done, paused or cancelled"""
+        send_priority.set(PRIORITY_BROADCAST)  # Quizzes and replies go ahead of broadcast messages
         try:
-            if auto_quiz_active_groups:
-                logger.info(f"⏰ Starting auto-quiz cycle for {len(auto_quiz_active_groups)} active groups")
-
-                cmd, (cat_id, emoji, desc) = random.choice(list(CATEGORIES.items()))
-                logger.info(f"🎯 Auto-quiz category: {desc} ({cat_id})")
-
-                for group_id in auto_quiz_active_groups.copy():
-                    try:
-                        logger.info(f"📤 Sending auto quiz to group {group_id}")
-                        await asyncio.sleep(1.5)
-                        
-                        await bot.send_chat_action(group_id, ChatAction.TYPING)
-
-                        q, opts, correct_id, correct = await fetch_quiz(cat_id)
-                        
-                        poll_msg = await bot.send_poll(
-                            chat_id=group_id,
-                            question=f"{q} {emoji}",
-                            options=opts,
-                            type="quiz",
-                            correct_option_id=correct_id,
-                            is_anonymous=False,
-                            explanation=f"💡 Correct Answer: {correct}",
-                        )
-                        
-                        # Store poll data using the same pattern - FIXED APPROACH
-                        poll_data = {
-                            'question': q,
-                            'correct_answer': correct,
-                            'options': opts,
-                            'category': desc,
-                            'group_id': group_id,
-                            'message_id': poll_msg.message_id,
-                            'chat_id': group_id,
-                            'timestamp': time.time(),
-                            'user_id': None  # Auto-quiz has no specific requester
-                        }
-                        
-                        # Store by message_id
-                        active_polls[f"msg_{poll_msg.message_id}"] = poll_data
-                        
-                        # If poll object is available, also store by poll_id
-                        if hasattr(poll_msg, 'poll') and poll_msg.poll and poll_msg.poll.id:
-                            active_polls[poll_msg.poll.id] = poll_data
-                            logger.info(f"📝 Auto-quiz poll data stored with poll_id: {poll_msg.poll.id}")
-                        
-                        logger.info(f"✅ Auto quiz sent to group {group_id}")
-                        
-                    except Exception as e:
-                        logger.warning(f"⚠️ Failed to send quiz to group {group_id}: {str(e)}")
-                        auto_quiz_active_groups.discard(group_id)
-
-            else:
-                logger.info("ℹ️ No active groups for auto-quiz")
-
-        except Exception as err:
-            logger.error(f"💥 Error in auto-quiz loop: {str(err)}")
+            job = await self.get_job(job_id)
+            if not job or job['status'] != "running":
+                return
+            logger.info(f"📡 Broadcast #{job_id} started: {job['sent'] + job['failed']}/{job['total']} already done")
+            
+            while True:
+                stop_status = self.stop_requests.pop(job_id, None)
+                if stop_status:
+                    await self.set_status(job_id, stop_status)
+                    job = await self.get_job(job_id)
+                    logger.info(f"⏹️ Broadcast #{job_id} {stop_status}")
+                    await self.show_progress(job, force=True)
+                    return
+                
+                async with db_acquire() as connection:
+                    rows = await connection.fetch('''
+                        SELECT target_id FROM broadcast_targets
+                        WHERE job_id = $1 AND status = 'pending'
+                        ORDER BY target_id
+                        LIMIT $2
+                    ''', job_id, BROADCAST_CHUNK_SIZE)
+                
+                if not rows:
+                    await self.set_status(job_id, "done")
+                    job = await self.get_job(job_id)
+                    logger.info(f"📈 Broadcast #{job_id} complete. Success: {job['sent']}, Failed: {job['failed']}")
+                    await self.show_progress(job, force=True)
+                    return
+                
+                results = await self.send_chunk(job, [row['target_id'] for row in rows])
+                job = await self.checkpoint(job_id, results)
+                if job['status'] != "running":
+                    # Paused or cancelled from another instance
+                    logger.info(f"⏹️ Broadcast #{job_id} {job['status']}")
+                    await self.show_progress(job, force=True)
+                    return
+                await self.show_progress(job)
+        
+        except asyncio.CancelledError:
+            raise  # Shutdown leaves the job 'running' so it resumes on the next start
+        except Exception as e:
+            logger.error(f"💥 Broadcast #{job_id} failed: {str(e)}")
+        finally:
+            self.tasks.pop(job_id, None)
+            self.progress_edited_at.pop(job_id, None)
+    
+    async def stop(self):
+        """Cancel all runners; unfinished jobs resume from their last checkpoint"""
+        for task in list(self.tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
 
-        logger.info("⏱️ Sleeping for 2 hours before next quiz cycle...")
-        await asyncio.sleep(7200)
+broadcast_engine = BroadcastEngine()
 
 @dp.message(Command("score"))
 async def cmd_score(msg: Message):
     """Handle score command to show leaderboard"""
     info = extract_user_info(msg)
-    logger.info(f"🏆 Score/leaderboard requested by {info['full_name']}")
-    
-    await bot.send_chat_action(msg.chat.id, ChatAction.TYPING)
+    update_logger.info("🏆 Score/leaderboard requested by %s", info['full_name'])
     
     # First, let's check if we have any data in the database at all
     if not db_pool:
         response = await msg.reply("❌ <b>Database Error</b>\n\nDatabase connection not available. Please try again later.")
         return
     
-    try:
-        # Check total users and quiz stats
-        async with db_pool.acquire() as connection:
-            total_users = await connection.fetchval("SELECT COUNT(*) FROM users")
-            total_quiz_attempts = await connection.fetchval("SELECT COUNT(*) FROM quiz_stats")
-            users_with_quizzes = await connection.fetchval("SELECT COUNT(*) FROM users WHERE total_quizzes > 0")
-            
-        logger.info(f"📊 Database stats: {total_users} total users, {users_with_quizzes} users with quizzes, {total_quiz_attempts} total attempts")
-        
-        if total_quiz_attempts == 0:
+    # Groups get their own leaderboard unless the global one is asked for with /score global
+    args = (msg.text or "").split()[1:]
+    if info['chat_type'] in ['group', 'supergroup'] and args[:1] != ['global']:
+        text = await get_group_leaderboard_text(msg.chat.id, info['chat_title'] or "Group")
+        if not text:
             response = await msg.reply(
-                "🏆 <b>iQ Lost Leaderboard</b> 🏆\n\n"
-                "❌ No quiz data available yet!\n\n"
+                "🏆 <b>Group Leaderboard</b> 🏆\n\n"
+                "❌ No quiz answers recorded in this group yet!\n\n"
                 "🎯 <b>Start playing quizzes to see the leaderboard!</b>\n"
-                f"📈 Total registered users: {total_users}\n"
-                f"📊 Quiz attempts recorded: {total_quiz_attempts}"
+                "🌍 Use /score global for the global leaderboard."
             )
-            logger.info(f"📋 Empty leaderboard sent (no data), ID: {response.message_id}")
+            update_logger.info("📋 Empty group leaderboard sent, ID: %s", response.message_id)
             return
+        
+        response = await msg.reply(text, disable_web_page_preview=True)
+        update_logger.info("🏆 Group leaderboard sent for %s, ID: %s", info['chat_title'], response.message_id)
+        return
+    
+    try:
+        if not leaderboard.loaded:
+            await leaderboard.load()
     
     except Exception as e:
-        logger.error(f"❌ Error checking database stats: {str(e)}")
+        logger.error(f"❌ Error loading leaderboard: {str(e)}")
         response = await msg.reply("❌ <b>Database Error</b>\n\nCould not retrieve leaderboard data. Please try again later.")
         return
     
+    total_users = leaderboard.total_users
+    total_quiz_attempts = leaderboard.total_quiz_attempts
+    update_logger.info("📊 Leaderboard stats: %s total users, %s users with quizzes, %s total attempts",
+                       total_users, leaderboard.users_with_quizzes, total_quiz_attempts)
+    
+    if total_quiz_attempts == 0:
+        response = await msg.reply(
+            "🏆 <b>iQ Lost Leaderboard</b> 🏆\n\n"
+            "❌ No quiz data available yet!\n\n"
+            "🎯 <b>Start playing quizzes to see the leaderboard!</b>\n"
+            f"📈 Total registered users: {total_users}\n"
+            f"📊 Quiz attempts recorded: {total_quiz_attempts}"
+        )
+        update_logger.info("📋 Empty leaderboard sent (no data), ID: %s", response.message_id)
+        return
+    
     # Get leaderboard data
-    leaderboard = await get_leaderboard(20)
+    leaderboard_rows = leaderboard.top(20)
     
-    if not leaderboard:
+    if not leaderboard_rows:
         response = await msg.reply(
             "🏆 <b>iQ Lost Leaderboard</b> 🏆\n\n"
             "❌ No quiz data available yet!\n\n"
@@ -875,208 +3131,182 @@ async def cmd_score(msg: Message):
             f"📊 Quiz attempts recorded: {total_quiz_attempts}\n\n"
             "🎯 <b>Start playing quizzes to see the leaderboard!</b>"
         )
-        logger.info(f"📋 Empty leaderboard sent, ID: {response.message_id}")
+        update_logger.info("📋 Empty leaderboard sent, ID: %s", response.message_id)
         return
     
-    # Build leaderboard message
-    text = "🏆 <b>iQ Lost Leaderboard</b> 🏆\n\n"
-    text += "<blockquote expandable>\n"
-    
-    medals = ["🥇", "🥈", "🥉"]
-    
-    for i, player in enumerate(leaderboard, 1):
-        user_id = player['user_id']
-        full_name = player['full_name'] or "Unknown Player"
-        correct = player['correct_answers']
-        wrong = player['wrong_answers']
-        total = player['total_quizzes']
-        accuracy = player['accuracy']
-        
-        # Create clickable mention
-        user_mention = f"<a href='tg://user?id={user_id}'>{full_name}</a>"
-        
-        # Get medal or rank number
-        if i <= 3:
-            rank_icon = medals[i-1]
-            text += f"{rank_icon} <b>{user_mention}</b>\n"
-        else:
-            text += f"{i}. <b>{user_mention}</b>\n"
-        
-        text += f" ╰─ W: {correct} | L: {wrong} | T: {total} | A: {accuracy}%\n\n"
-    
-    text += "</blockquote>\n\n"
-    text += f"🎗️ <b>Only top 20 shown! Total players: {len(leaderboard)}</b>"
+    # Reuse the rendered message unless the top players changed
+    text = get_cached_leaderboard_text("global", leaderboard.version, leaderboard_rows)
     
     response = await msg.reply(text, disable_web_page_preview=True)
-    logger.info(f"🏆 Leaderboard sent with {len(leaderboard)} players, ID: {response.message_id}")
+    update_logger.info("🏆 Leaderboard sent with %s players, ID: %s", len(leaderboard_rows), response.message_id)
 
 # Category command handlers
 @dp.message(Command("general"))
 async def cmd_general(msg: Message):
     """Handle general knowledge quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🧠 General quiz requested by {info['full_name']}")
+    update_logger.info("🧠 General quiz requested by %s", info['full_name'])
     await send_quiz(msg, 9, "🧠", "General Knowledge")
 
 @dp.message(Command("books"))
 async def cmd_books(msg: Message):
     """Handle books quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"📚 Books quiz requested by {info['full_name']}")
+    update_logger.info("📚 Books quiz requested by %s", info['full_name'])
     await send_quiz(msg, 10, "📚", "Books")
 
 @dp.message(Command("film"))
 async def cmd_film(msg: Message):
     """Handle film quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🎬 Film quiz requested by {info['full_name']}")
+    update_logger.info("🎬 Film quiz requested by %s", info['full_name'])
     await send_quiz(msg, 11, "🎬", "Film")
 
 @dp.message(Command("music"))
 async def cmd_music(msg: Message):
     """Handle music quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🎵 Music quiz requested by {info['full_name']}")
+    update_logger.info("🎵 Music quiz requested by %s", info['full_name'])
     await send_quiz(msg, 12, "🎵", "Music")
 
 @dp.message(Command("musicals"))
 async def cmd_musicals(msg: Message):
     """Handle musicals quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🎭 Musicals quiz requested by {info['full_name']}")
+    update_logger.info("🎭 Musicals quiz requested by %s", info['full_name'])
     await send_quiz(msg, 13, "🎭", "Musicals")
 
 @dp.message(Command("tv"))
 async def cmd_tv(msg: Message):
     """Handle TV shows quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"📺 TV quiz requested by {info['full_name']}")
+    update_logger.info("📺 TV quiz requested by %s", info['full_name'])
     await send_quiz(msg, 14, "📺", "TV Shows")
 
 @dp.message(Command("games"))
 async def cmd_games(msg: Message):
     """Handle video games quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🎮 Games quiz requested by {info['full_name']}")
+    update_logger.info("🎮 Games quiz requested by %s", info['full_name'])
     await send_quiz(msg, 15, "🎮", "Video Games")
 
 @dp.message(Command("board"))
 async def cmd_board(msg: Message):
     """Handle board games quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🎲 Board games quiz requested by {info['full_name']}")
+    update_logger.info("🎲 Board games quiz requested by %s", info['full_name'])
     await send_quiz(msg, 16, "🎲", "Board Games")
 
 @dp.message(Command("nature"))
 async def cmd_nature(msg: Message):
     """Handle nature quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🌿 Nature quiz requested by {info['full_name']}")
+    update_logger.info("🌿 Nature quiz requested by %s", info['full_name'])
     await send_quiz(msg, 17, "🌿", "Nature")
 
 @dp.message(Command("computers"))
 async def cmd_computers(msg: Message):
     """Handle computers quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"💻 Computers quiz requested by {info['full_name']}")
+    update_logger.info("💻 Computers quiz requested by %s", info['full_name'])
     await send_quiz(msg, 18, "💻", "Computers")
 
 @dp.message(Command("math"))
 async def cmd_math(msg: Message):
     """Handle mathematics quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"➗ Math quiz requested by {info['full_name']}")
+    update_logger.info("➗ Math quiz requested by %s", info['full_name'])
     await send_quiz(msg, 19, "➗", "Mathematics")
 
 @dp.message(Command("mythology"))
 async def cmd_mythology(msg: Message):
     """Handle mythology quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"⚡ Mythology quiz requested by {info['full_name']}")
+    update_logger.info("⚡ Mythology quiz requested by %s", info['full_name'])
     await send_quiz(msg, 20, "⚡", "Mythology")
 
 @dp.message(Command("sports"))
 async def cmd_sports(msg: Message):
     """Handle sports quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🏅 Sports quiz requested by {info['full_name']}")
+    update_logger.info("🏅 Sports quiz requested by %s", info['full_name'])
     await send_quiz(msg, 21, "🏅", "Sports")
 
 @dp.message(Command("geography"))
 async def cmd_geography(msg: Message):
     """Handle geography quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🌍 Geography quiz requested by {info['full_name']}")
+    update_logger.info("🌍 Geography quiz requested by %s", info['full_name'])
     await send_quiz(msg, 22, "🌍", "Geography")
 
 @dp.message(Command("history"))
 async def cmd_history(msg: Message):
     """Handle history quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"📜 History quiz requested by {info['full_name']}")
+    update_logger.info("📜 History quiz requested by %s", info['full_name'])
     await send_quiz(msg, 23, "📜", "History")
 
 @dp.message(Command("politics"))
 async def cmd_politics(msg: Message):
     """Handle politics quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🏛️ Politics quiz requested by {info['full_name']}")
+    update_logger.info("🏛️ Politics quiz requested by %s", info['full_name'])
     await send_quiz(msg, 24, "🏛️", "Politics")
 
 @dp.message(Command("art"))
 async def cmd_art(msg: Message):
     """Handle art quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🎨 Art quiz requested by {info['full_name']}")
+    update_logger.info("🎨 Art quiz requested by %s", info['full_name'])
     await send_quiz(msg, 25, "🎨", "Art")
 
 @dp.message(Command("celebs"))
 async def cmd_celebs(msg: Message):
     """Handle celebrities quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"⭐ Celebrities quiz requested by {info['full_name']}")
+    update_logger.info("⭐ Celebrities quiz requested by %s", info['full_name'])
     await send_quiz(msg, 26, "⭐", "Celebrities")
 
 @dp.message(Command("animals"))
 async def cmd_animals(msg: Message):
     """Handle animals quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🐾 Animals quiz requested by {info['full_name']}")
+    update_logger.info("🐾 Animals quiz requested by %s", info['full_name'])
     await send_quiz(msg, 27, "🐾", "Animals")
 
 @dp.message(Command("vehicles"))
 async def cmd_vehicles(msg: Message):
     """Handle vehicles quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🚗 Vehicles quiz requested by {info['full_name']}")
+    update_logger.info("🚗 Vehicles quiz requested by %s", info['full_name'])
     await send_quiz(msg, 28, "🚗", "Vehicles")
 
 @dp.message(Command("comics"))
 async def cmd_comics(msg: Message):
     """Handle comics quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"💥 Comics quiz requested by {info['full_name']}")
+    update_logger.info("💥 Comics quiz requested by %s", info['full_name'])
     await send_quiz(msg, 29, "💥", "Comics")
 
 @dp.message(Command("gadgets"))
 async def cmd_gadgets(msg: Message):
     """Handle gadgets quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"📱 Gadgets quiz requested by {info['full_name']}")
+    update_logger.info("📱 Gadgets quiz requested by %s", info['full_name'])
     await send_quiz(msg, 30, "📱", "Gadgets")
 
 @dp.message(Command("anime"))
 async def cmd_anime(msg: Message):
     """Handle anime quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🀄 Anime quiz requested by {info['full_name']}")
+    update_logger.info("🀄 Anime quiz requested by %s", info['full_name'])
     await send_quiz(msg, 31, "🀄", "Anime")
 
 @dp.message(Command("cartoons"))
 async def cmd_cartoons(msg: Message):
     """Handle cartoons quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🎪 Cartoons quiz requested by {info['full_name']}")
+    update_logger.info("🎪 Cartoons quiz requested by %s", info['full_name'])
     await send_quiz(msg, 32, "🎪", "Cartoons")
 
 def register_category_handlers():
@@ -1112,23 +3342,23 @@ IMAGE_URLS = [
 async def cmd_start(msg: Message):
     """Handle start command with welcome message and inline buttons"""
     info = extract_user_info(msg)
-    logger.info(f"🚀 Start command received from {info['full_name']} (ID: {msg.from_user.id})")
+    update_logger.info("🚀 Start command received from %s (ID: %s)", info['full_name'], msg.from_user.id)
 
     # Save user to database
     await save_user(msg.from_user.id, info['username'], info['full_name'])
     user_ids.add(msg.from_user.id)
-    logger.info(f"👥 User added to database. Total users: {len(user_ids)}")
+    update_logger.info("👥 User added to database. Total users: %s", len(user_ids))
 
     if info['chat_type'] in ['group', 'supergroup']:
         group_ids.add(msg.chat.id)
-        auto_quiz_active_groups.add(msg.chat.id)  # Activate auto-quiz
+        activate_auto_quiz(msg.chat.id)
         await save_group(msg.chat.id, info['chat_title'], info['chat_username'])
-        logger.info(f"📢 Group added to database and auto-quiz activated. Total groups: {len(group_ids)}")
+        update_logger.info("📢 Group added to database and auto-quiz activated. Total groups: %s", len(group_ids))
 
     logger.debug("⌨️ Showing typing indicator")
     await bot.send_chat_action(msg.chat.id, ChatAction.TYPING)
 
-    logger.info("🔗 Creating inline keyboard with channel and group links")
+    update_logger.info("🔗 Creating inline keyboard with channel and group links")
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [
             InlineKeyboardButton(text="Updates", url="https://t.me/WorkGlows"),
@@ -1158,11 +3388,11 @@ async def cmd_start(msg: Message):
 🚀 <b>Let's begin your quiz journey now!</b>"""
 
     selected_image = random.choice(IMAGE_URLS)
-    logger.debug(f"🖼️ Selected random image URL: {selected_image}")
+    logger.debug("🖼️ Selected random image URL: %s", selected_image)
 
-    logger.info("📤 Sending welcome message with image and inline buttons")
+    update_logger.info("📤 Sending welcome message with image and inline buttons")
     if info['chat_type'] in ['group', 'supergroup']:
-        logger.info(f"📢 Sending image as reply in group '{info['chat_title']}' (ID: {msg.chat.id})")
+        update_logger.info("📢 Sending image as reply in group '%s' (ID: %s)", info['chat_title'], msg.chat.id)
         response = await msg.reply_photo(
             photo=selected_image,
             caption=text,
@@ -1170,7 +3400,7 @@ async def cmd_start(msg: Message):
             reply_markup=keyboard
         )
     else:
-        logger.info(f"💬 Sending image in private chat with {info['full_name']}")
+        update_logger.info("💬 Sending image in private chat with %s", info['full_name'])
         response = await msg.answer_photo(
             photo=selected_image,
             caption=text,
@@ -1178,59 +3408,118 @@ async def cmd_start(msg: Message):
             reply_markup=keyboard
         )
 
-    logger.info(f"✅ Welcome image with caption sent successfully, Message ID: {response.message_id}")
+    update_logger.info("✅ Welcome image with caption sent successfully, Message ID: %s", response.message_id)
     logger.debug("📡 /start command handling complete")
 
 @dp.message(Command("help"))
 async def cmd_help(msg: Message):
     """Handle help command showing all categories"""
     info = extract_user_info(msg)
-    logger.info(f"❓ Help command requested by {info['full_name']}")
+    update_logger.info("❓ Help command requested by %s", info['full_name'])
 
     # Save user to database
     await save_user(msg.from_user.id, info['username'], info['full_name'])
     user_ids.add(msg.from_user.id)
-    logger.info(f"👥 User added to database. Total users: {len(user_ids)}")
+    update_logger.info("👥 User added to database. Total users: %s", len(user_ids))
     
     # Track groups when help is used
     if info['chat_type'] in ['group', 'supergroup']:
         group_ids.add(msg.chat.id)
-        auto_quiz_active_groups.add(msg.chat.id)  # Activate auto-quiz
+        activate_auto_quiz(msg.chat.id)
         await save_group(msg.chat.id, info['chat_title'], info['chat_username'])
-        logger.info(f"📢 Group added to database and auto-quiz activated. Total groups: {len(group_ids)}")
+        update_logger.info("📢 Group added to database and auto-quiz activated. Total groups: %s", len(group_ids))
 
     await bot.send_chat_action(msg.chat.id, ChatAction.TYPING)
 
-    logger.info("📤 Sending basic help message with expand option")
+    update_logger.info("📤 Sending basic help message with expand option")
     await show_basic_help(msg)
-    logger.info("✅ Help message sent successfully")
+    update_logger.info("✅ Help message sent successfully")
     
 @dp.message(Command("random"))
 async def cmd_random(msg: Message):
     """Handle random quiz command"""
     info = extract_user_info(msg)
-    logger.info(f"🎲 Random quiz requested by {info['full_name']}")
+    update_logger.info("🎲 Random quiz requested by %s", info['full_name'])
     
     # Save user to database
     await save_user(msg.from_user.id, info['username'], info['full_name'])
     user_ids.add(msg.from_user.id)
-    logger.info(f"👥 User added to database. Total users: {len(user_ids)}")
+    update_logger.info("👥 User added to database. Total users: %s", len(user_ids))
     
     # Track groups when random quiz is used
     if info['chat_type'] in ['group', 'supergroup']:
         group_ids.add(msg.chat.id)
-        auto_quiz_active_groups.add(msg.chat.id)  # Activate auto-quiz
+        activate_auto_quiz(msg.chat.id)
         await save_group(msg.chat.id, info['chat_title'], info['chat_username'])
-        logger.info(f"📢 Group added to database and auto-quiz activated. Total groups: {len(group_ids)}")
+        update_logger.info("📢 Group added to database and auto-quiz activated. Total groups: %s", len(group_ids))
     
     await bot.send_chat_action(msg.chat.id, ChatAction.TYPING)
     
-    logger.info("🎯 Selecting random category from available options")
+    update_logger.info("🎯 Selecting random category from available options")
     cmd, (cat_id, emoji, desc) = random.choice(list(CATEGORIES.items()))
-    logger.info(f"✨ Random category selected: {cmd} (ID: {cat_id}, {emoji} {desc})")
+    update_logger.info("✨ Random category selected: %s (ID: %s, %s %s)", cmd, cat_id, emoji, desc)
     
     await send_quiz(msg, cat_id, emoji, desc)
 
+@dp.message(Command("autoquiz"))
+async def cmd_autoquiz(msg: Message):
+    """Show or change the auto-quiz interval and categories of a group (admins only)"""
+    info = extract_user_info(msg)
+    logger.info(f"⏰ Auto-quiz settings requested by {info['full_name']} in {info['chat_title']}")
+    
+    if info['chat_type'] not in ['group', 'supergroup']:
+        await msg.answer("ℹ️ Auto-quiz settings are only available in groups.")
+        return
+    
+    group_id = msg.chat.id
+    args = (msg.text or "").split()[1:]
+    interval, categories = auto_quiz_scheduler.settings.get(group_id, (AUTO_QUIZ_INTERVAL, None))
+    
+    if not args:
+        status = f"every {interval // 60} minutes" if interval > 0 else "off"
+        await msg.reply(
+            "⏰ <b>Auto-Quiz Settings</b>\n\n"
+            f"🔁 <b>Interval:</b> {status}\n"
+            f"📚 <b>Categories:</b> {', '.join(categories) if categories else 'all'}\n\n"
+            "⚙️ <code>/autoquiz 60</code> - every 60 minutes\n"
+            "⚙️ <code>/autoquiz 60 music,history</code> - only these categories\n"
+            "⚙️ <code>/autoquiz 60 all</code> - back to all categories\n"
+            "⚙️ <code>/autoquiz off</code> - turn auto-quiz off"
+        )
+        return
+    
+    if msg.from_user.id != OWNER_ID:
+        member = await bot.get_chat_member(group_id, msg.from_user.id)
+        if member.status not in ("creator", "administrator"):
+            await msg.reply("⛔ Only group admins can change auto-quiz settings.")
+            return
+    
+    if args[0].lower() == "off":
+        interval, categories = 0, categories
+    elif args[0].isdigit() and int(args[0]) * 60 >= AUTO_QUIZ_MIN_INTERVAL:
+        interval = int(args[0]) * 60
+        if len(args) > 1:
+            requested = [c.strip().lower() for c in args[1].split(",") if c.strip()]
+            if "all" in requested:
+                categories = None
+            else:
+                unknown = [c for c in requested if c not in CATEGORIES]
+                if unknown:
+                    await msg.reply(f"❌ Unknown categories: {', '.join(unknown)}")
+                    return
+                categories = requested
+    else:
+        await msg.reply(f"❌ Use a number of minutes (at least {AUTO_QUIZ_MIN_INTERVAL // 60}) or <code>off</code>.")
+        return
+    
+    await save_group(group_id, info['chat_title'], info['chat_username'])
+    await save_auto_quiz_settings(group_id, interval, categories)
+    auto_quiz_scheduler.configure(group_id, interval, categories)
+    
+    status = f"every {interval // 60} minutes" if interval > 0 else "off"
+    await msg.reply(f"✅ Auto-quiz is now {status} ({', '.join(categories) if categories else 'all categories'}).")
+    logger.info(f"⏰ Auto-quiz for group {group_id} set to {status}, categories: {categories or 'all'}")
+
 @dp.message(Command("broadcast"))
 async def cmd_broadcast(msg: Message):
     """Handle broadcast command (owner only)"""
@@ -1271,12 +3560,16 @@ async def ping_command(msg: Message):
     """Respond with bot latency (unregistered command)"""
     info = extract_user_info(msg)
 
-    logger.info(f"📥 /ping received | Name: {info['full_name']} | Username: @{info['username']} | User ID: {info['user_id']} | Chat: {info['chat_title']} ({info['chat_type']}) | Chat ID: {info['chat_id']} | Link: {info['chat_link']}")
+    update_logger.info(
+        "📥 /ping received | Name: %s | Username: @%s | User ID: %s | Chat: %s (%s) | Chat ID: %s | Link: %s",
+        info['full_name'], info['username'], info['user_id'], info['chat_title'], info['chat_type'],
+        info['chat_id'], info['chat_link']
+    )
 
     start = time.perf_counter()
 
     try:
-        logger.debug(f"💬 Sending 'Pinging...' | User ID: {info['user_id']} | Chat ID: {info['chat_id']} | Name: {info['full_name']}")
+        logger.debug("💬 Sending 'Pinging...' | User ID: %s | Chat ID: %s | Name: %s", info['user_id'], info['chat_id'], info['full_name'])
 
         await bot.send_chat_action(msg.chat.id, ChatAction.TYPING)
 
@@ -1289,7 +3582,7 @@ async def ping_command(msg: Message):
         end = time.perf_counter()
         response_time = round((end - start) * 1000, 2)
 
-        logger.debug(f"⏱️ Latency calculated: {response_time}ms | User ID: {info['user_id']} | Chat ID: {info['chat_id']} | Name: {info['full_name']}")
+        logger.debug("⏱️ Latency calculated: %sms | User ID: %s | Chat ID: %s | Name: %s", response_time, info['user_id'], info['chat_id'], info['full_name'])
 
         await response.edit_text(
             f"🏓 <a href='https://t.me/SoulMeetsHQ'>Pong!</a> {response_time}ms",
@@ -1297,11 +3590,68 @@ async def ping_command(msg: Message):
             disable_web_page_preview=True
         )
 
-        logger.info(f"✅ Pong sent | Latency: {response_time}ms | Name: {info['full_name']} | Username: @{info['username']} | User ID: {info['user_id']} | Chat: {info['chat_title']} ({info['chat_type']}) | Chat ID: {info['chat_id']} | Link: {info['chat_link']}")
+        update_logger.info(
+            "✅ Pong sent | Latency: %sms | Name: %s | Username: @%s | User ID: %s | Chat: %s (%s) | Chat ID: %s | Link: %s",
+            response_time, info['full_name'], info['username'], info['user_id'], info['chat_title'],
+            info['chat_type'], info['chat_id'], info['chat_link']
+        )
 
     except Exception as e:
         logger.error(f"❌ /ping failed | Name: {info['full_name']} | Username: @{info['username']} | User ID: {info['user_id']} | Chat: {info['chat_title']} ({info['chat_type']}) | Chat ID: {info['chat_id']} | Link: {info['chat_link']} | Error: {str(e)}")
 
+@dp.message(Command("broadcasts"))
+async def cmd_broadcasts(msg: Message):
+    """List recent broadcast jobs with their controls (owner only)"""
+    if msg.from_user.id != OWNER_ID:
+        await msg.answer("⛔ This command is restricted.")
+        return
+    
+    async with db_acquire() as connection:
+        jobs = await connection.fetch("SELECT * FROM broadcast_jobs ORDER BY job_id DESC LIMIT 5")
+    
+    if not jobs:
+        await msg.answer("📭 No broadcasts yet.")
+        return
+    
+    for job in jobs:
+        await msg.answer(broadcast_progress_text(job), reply_markup=broadcast_keyboard(job['job_id'], job['status']))
+
+@dp.callback_query(F.data.startswith("bjob_"))
+async def handle_broadcast_job_action(callback: types.CallbackQuery):
+    """Pause, resume or cancel a broadcast job"""
+    if callback.from_user.id != OWNER_ID:
+        await callback.answer("⛔ This command is restricted.", show_alert=True)
+        return
+    
+    _, action, job_id = callback.data.split("_")
+    job_id = int(job_id)
+    job = await broadcast_engine.get_job(job_id)
+    if not job:
+        await callback.answer("❌ Broadcast not found.", show_alert=True)
+        return
+    
+    if action in ("pause", "cancel"):
+        status = "paused" if action == "pause" else "cancelled"
+        if not broadcast_engine.request_stop(job_id, status):
+            if job['status'] in ("done", "cancelled"):
+                await callback.answer("ℹ️ This broadcast has already finished.")
+                return
+            await broadcast_engine.set_status(job_id, status)
+            await broadcast_engine.show_progress(await broadcast_engine.get_job(job_id), force=True)
+        logger.info(f"👑 Broadcast #{job_id} {action} requested by owner")
+        await callback.answer("⏹️ Stopping after the current batch..." if job['status'] == "running" else "✅ Done")
+    elif action == "resume":
+        if job['status'] in ("done", "cancelled"):
+            await callback.answer("ℹ️ This broadcast has already finished.")
+            return
+        await broadcast_engine.set_status(job_id, "running")
+        broadcast_engine.start(job_id)
+        await broadcast_engine.show_progress(await broadcast_engine.get_job(job_id), force=True)
+        logger.info(f"👑 Broadcast #{job_id} resumed by owner")
+        await callback.answer("▶️ Resumed")
+    else:
+        await callback.answer()
+
 # Store help page states for users
 help_page_states = {}
 
@@ -1332,7 +3682,8 @@ async def handle_help_pagination(callback: types.CallbackQuery):
         await callback.message.edit_text(
             f"📣 <b>Broadcast mode enabled!</b>\n\n"
             f"🎯 <b>Target:</b> {target_text} ({target_count})\n\n"
-            "Send me any message and I will forward it to all selected targets."
+            "Send me any message and I will forward it to all selected targets.\n"
+            "📋 Use /broadcasts to see recent jobs."
         )
         
         logger.info(f"✅ Broadcast mode enabled for {target}, message ID: {callback.message.message_id}")
@@ -1547,7 +3898,8 @@ Unlock all features, {user_mention}! 🔓
 /score - View global leaderboard
 
 🚀 <b>Auto-Quiz:</b>
-Groups get automatic quizzes every 2 hours once activated!""",
+Groups get automatic quizzes every 2 hours once activated!
+Admins can change it with /autoquiz.""",
         
         9: f"""🏆 <b>Challenge Yourself (9/10)</b>
 
@@ -1626,89 +3978,58 @@ async def catch_all(msg: Message):
     info = extract_user_info(msg)
 
     if msg.from_user.id in broadcast_mode:
-        logger.info(f"📡 Broadcasting message from owner {info['full_name']}")
-        await bot.send_chat_action(msg.chat.id, ChatAction.TYPING)
-
-        success_count = 0
-        fail_count = 0
+        logger.info("📡 Broadcasting message from owner %s", info['full_name'])
 
         target = broadcast_target.get(msg.from_user.id, "users")
-        
-        # Get actual target IDs from database
-        if target == "users":
-            target_ids = await get_all_user_ids()
-        else:
-            target_ids = await get_all_group_ids()
-        
-        target_name = "users" if target == "users" else "groups"
-
-        logger.info(f"📊 Starting broadcast to {len(target_ids)} {target_name}")
-
-        for target_id in list(target_ids):  # Convert to list to avoid set modification during iteration
-            try:
-                if msg.forward_from or msg.forward_from_chat:
-                    # If it's a forwarded message, use forward_message to preserve attribution
-                    await bot.forward_message(
-                        chat_id=target_id,
-                        from_chat_id=msg.chat.id,
-                        message_id=msg.message_id
-                    )
-                else:
-                    # Otherwise, use copy_message (better compatibility)
-                    await bot.copy_message(
-                        chat_id=target_id,
-                        from_chat_id=msg.chat.id,
-                        message_id=msg.message_id
-                    )
-
-                success_count += 1
-                logger.debug(f"✅ Broadcast sent successfully to {target_name[:-1]} {target_id}")
-            except Exception as e:
-                fail_count += 1
-                logger.warning(f"❌ Failed to send broadcast to {target_name[:-1]} {target_id}: {str(e)}")
 
         # Clean up broadcast state
         broadcast_mode.remove(msg.from_user.id)
         broadcast_target.pop(msg.from_user.id, None)
 
-        logger.info(f"📈 Broadcast complete. Success: {success_count}, Failed: {fail_count}")
-
-        response = await msg.answer(
-            f"📊 <b>Broadcast complete!</b>\n\n"
-            f"🎯 <b>Target:</b> {target_name.capitalize()}\n"
-            f"✅ <b>Sent:</b> {success_count}\n"
-            f"❌ <b>Failed:</b> {fail_count}\n\n"
-            f"🔒 Broadcast mode disabled."
-        )
-        logger.info(f"📋 Broadcast summary sent, ID: {response.message_id}")
+        try:
+            job_id = await broadcast_engine.create_job(msg.from_user.id, target, msg)
+            job = await broadcast_engine.get_job(job_id)
+            progress = await msg.answer(broadcast_progress_text(job), reply_markup=broadcast_keyboard(job_id, job['status']))
+            
+            async with db_acquire() as connection:
+                await connection.execute('''
+                    UPDATE broadcast_jobs SET progress_chat_id = $2, progress_message_id = $3
+                    WHERE job_id = $1
+                ''', job_id, progress.chat.id, progress.message_id)
+            
+            logger.info("📊 Broadcast #%s queued for %s %s", job_id, job['total'], target)
+            broadcast_engine.start(job_id)
+        except Exception as e:
+            logger.error(f"❌ Failed to create broadcast job: {str(e)}")
+            await msg.answer("❌ Failed to start the broadcast. Please try again.")
         
     elif info['chat_type'] in ['group', 'supergroup']:
         # Handle group messages for auto-quiz activation
-        logger.debug(f"💬 Group message received in {info['chat_title']}")
+        logger.debug("💬 Group message received in %s", info['chat_title'])
         
         # Save group info and activate auto-quiz
         group_ids.add(msg.chat.id)
-        auto_quiz_active_groups.add(msg.chat.id)
+        activate_auto_quiz(msg.chat.id)
         await save_group(msg.chat.id, info['chat_title'], info['chat_username'])
         
         # Save user info
         await save_user(msg.from_user.id, info['username'], info['full_name'])
         user_ids.add(msg.from_user.id)
         
-        logger.info(f"🎯 Auto-quiz activated for group {info['chat_title']} due to member activity")
+        update_logger.info("🎯 Auto-quiz activated for group %s due to member activity", info['chat_title'])
         
     else:
         # Only respond to unknown commands in private chats, not groups
         if info['chat_type'] not in ['group', 'supergroup']:
-            logger.debug(f"❓ Unknown command from user {info['full_name']} in private chat")
+            logger.debug("❓ Unknown command from user %s in private chat", info['full_name'])
             await bot.send_chat_action(msg.chat.id, ChatAction.TYPING)
             response = await msg.answer("🤔 I don't understand that command. Type /help to see available commands.")
-            logger.info(f"💭 Unknown command response sent, ID: {response.message_id}")
+            update_logger.info("💭 Unknown command response sent, ID: %s", response.message_id)
 
 async def global_error_handler(update: Update, exception):
     """Handle global errors gracefully"""
     logger.error(f"💥 Global error occurred: {str(exception)}")
-    logger.debug(f"🔍 Update that caused error: {update}")
+    logger.debug("🔍 Update that caused error: %s", update)
     return True
 
 async def setup_bot_commands():
@@ -1729,6 +4050,121 @@ async def setup_bot_commands():
     await bot.set_my_commands(cmds)
     logger.info("✅ Bot command menu configured successfully")
 
+# ─── Leader Election ────────────────────────────────────────────────────────
+# Any stable 64-bit key works, as long as every instance uses the same one
+LEADER_LOCK_KEY = int(os.getenv("LEADER_LOCK_KEY", "7305746212381923585"))
+LEADER_CHECK_SECONDS = 5  # Followers retry and the leader heartbeats this often
+LEADER_JOB_RESTART_SECONDS = 5  # First backoff before a crashed leader job is restarted
+LEADER_JOB_MAX_BACKOFF = 300
+
+class LeaderElection:
+    """Hold a Postgres advisory lock on a dedicated connection; the holder runs the singleton jobs"""
+    
+    def __init__(self, lock_key: int):
+        self.lock_key = lock_key
+        self.connection: Optional[asyncpg.Connection] = None
+        self.is_leader = False
+        self.jobs: List[asyncio.Task] = []
+        self.task: Optional[asyncio.Task] = None
+    
+    def leader_jobs(self) -> list:
+        """Background loops that must run on exactly one instance"""
+        jobs = [
+            quiz_stats_maintenance_loop,
+            poll_cleanup_loop,
+            run_auto_quiz_scheduler,
+            broadcast_engine.watch,
+            warm_question_pools,
+        ]
+        if QUESTION_BANK_HARVEST:
+            jobs.append(harvest_question_bank)
+        return jobs
+    
+    async def try_acquire(self) -> bool:
+        if self.connection is None or self.connection.is_closed():
+            self.connection = await asyncpg.connect(DATABASE_URL)
+        return await self.connection.fetchval("SELECT pg_try_advisory_lock($1)", self.lock_key)
+    
+    async def still_held(self) -> bool:
+        """The lock lives as long as the session, so a live connection means we are still leader"""
+        try:
+            await asyncio.wait_for(self.connection.fetchval("SELECT 1"), timeout=LEADER_CHECK_SECONDS)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Leader connection check failed: {str(e)}")
+            return False
+    
+    def become_leader(self):
+        self.is_leader = True
+        logger.info("👑 This instance is now the leader, starting background jobs")
+        outbound_scheduler.set_leader(True)
+        self.jobs = [asyncio.create_task(self.supervise_job(job)) for job in self.leader_jobs()]
+    
+    async def supervise_job(self, job):
+        """Run one leader job, restarting it with backoff when it crashes; jobs that return are done"""
+        delay = LEADER_JOB_RESTART_SECONDS
+        while True:
+            started = time.monotonic()
+            try:
+                await job()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A job that ran for a while before failing starts over with the short backoff
+                if time.monotonic() - started > LEADER_JOB_MAX_BACKOFF:
+                    delay = LEADER_JOB_RESTART_SECONDS
+                logger.error(f"❌ Leader job {job.__name__} crashed: {str(e)} - restarting in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LEADER_JOB_MAX_BACKOFF)
+    
+    async def step_down(self):
+        """Stop the leader jobs and release the lock by closing its session"""
+        if self.is_leader:
+            logger.warning("👑 Stepping down as leader, stopping background jobs")
+            outbound_scheduler.set_leader(False)
+        self.is_leader = False
+        for task in self.jobs:
+            task.cancel()
+        await asyncio.gather(*self.jobs, return_exceptions=True)
+        self.jobs = []
+        if self.connection is not None and not self.connection.is_closed():
+            try:
+                await self.connection.close(timeout=LEADER_CHECK_SECONDS)
+            except Exception:
+                self.connection.terminate()
+        self.connection = None
+    
+    async def check(self):
+        """One election round: heartbeat as leader, or try to take the lock as follower"""
+        try:
+            if self.is_leader:
+                if not await self.still_held():
+                    await self.step_down()
+            elif await self.try_acquire():
+                self.become_leader()
+        except Exception as e:
+            logger.warning(f"⚠️ Leader election round failed: {str(e)}")
+            await self.step_down()
+    
+    async def run(self):
+        while True:
+            await asyncio.sleep(LEADER_CHECK_SECONDS)
+            await self.check()
+    
+    async def start(self):
+        await self.check()
+        if not self.is_leader:
+            logger.info("🧍 Another instance is the leader, standing by")
+        self.task = asyncio.create_task(self.run())
+    
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+        await self.step_down()
+
+leader_election = LeaderElection(LEADER_LOCK_KEY)
+
 async def on_startup():
     """Initialize bot resources on startup"""
     logger.info("🌟 Bot startup sequence initiated")
@@ -1736,11 +4172,26 @@ async def on_startup():
     global session
     logger.info("🌐 Creating HTTP session for API requests")
     session = aiohttp.ClientSession()
+    opentdb.session = session
     logger.info("✅ HTTP session created successfully")
     
     logger.info("🗄️ Initializing database connection")
     await init_database()
     
+    logger.info("📥 Starting quiz answer write-behind queue")
+    answer_writer.start()
+    
+    logger.info("👤 Starting profile write-behind queues")
+    user_profile_writer.start()
+    group_profile_writer.start()
+    
+    logger.info("🗳️ Starting poll registry writer")
+    poll_writer.start()
+    
+    if AUDIT_MODE != "off":
+        logger.info("🔎 Starting answer audit worker")
+        asyncio.create_task(audit_worker())
+    
     logger.info("⚙️ Setting up bot commands menu")
     await setup_bot_commands()
     
@@ -1749,13 +4200,26 @@ async def on_startup():
     logger.info(f"🤖 Bot connected successfully: @{me.username} (ID: {me.id})")
     
     # Load existing users and groups from database
-    global user_ids, group_ids, auto_quiz_active_groups
+    global user_ids, group_ids
     user_ids = await get_all_user_ids()
     group_ids = await get_all_group_ids()
-    auto_quiz_active_groups = group_ids.copy()  # All existing groups are active
     
     logger.info(f"📊 Loaded {len(user_ids)} users and {len(group_ids)} groups from database")
     
+    logger.info("🗓️ Loading auto-quiz settings")
+    await auto_quiz_scheduler.load()
+    
+    logger.info("🏆 Loading in-memory leaderboard")
+    await leaderboard.load()
+    asyncio.create_task(leaderboard_reconcile_loop())
+    
+    # The leader runs auto-quiz, broadcasts, maintenance, poll cleanup and OpenTDB pool refills
+    logger.info("🗳️ Joining leader election")
+    await leader_election.start()
+    if not leader_election.is_leader:
+        logger.info("🧺 Warming question pools from the question bank")
+        asyncio.create_task(warm_question_pools())
+    
     logger.info("🎉 Startup sequence completed - bot is ready!")
 
 async def on_shutdown():
@@ -1768,6 +4232,22 @@ async def on_shutdown():
         await session.close()
         logger.info("✅ HTTP session closed successfully")
     
+    logger.info("👑 Leaving leader election")
+    await leader_election.stop()
+    
+    if answer_writer.running:
+        logger.info("📥 Flushing queued quiz answers")
+        await answer_writer.stop()
+    
+    if profile_writers_running():
+        logger.info("👤 Flushing queued profiles")
+        await user_profile_writer.stop()
+        await group_profile_writer.stop()
+    
+    if poll_writer.running:
+        logger.info("🗳️ Flushing queued polls")
+        await poll_writer.stop()
+    
     if db_pool:
         logger.info("🗄️ Closing database connection pool")
         await db_pool.close()
@@ -1775,31 +4255,331 @@ async def on_shutdown():
     
     logger.info("👋 Bot shutdown completed")
 
- # ─── Dummy HTTP Server to Keep Render Happy ─────────────────────────────────
-class DummyHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.end_headers()
-        self.wfile.write(b"iQ Lost Quiz Bot is alive!")
+# ─── Web Server: Webhook, Health Check and Ops ──────────────────────────────
+process_started_at = time.time()
+
+async def handle_root(request: web.Request) -> web.Response:
+    return web.Response(text="iQ Lost Quiz Bot is alive!")
+
+async def handle_health(request: web.Request) -> web.Response:
+    """Report whether the database answers; used by the platform health check"""
+    db_ok = False
+    if db_pool:
+        try:
+            async with db_acquire() as connection:
+                db_ok = await connection.fetchval("SELECT 1") == 1
+        except Exception as e:
+            logger.warning(f"⚠️ Health check database probe failed: {str(e)}")
+    
+    return web.json_response(
+        {"status": "ok" if db_ok else "degraded", "database": db_ok, "mode": BOT_MODE,
+         "uptime": round(time.time() - process_started_at)},
+        status=200 if db_ok else 503
+    )
+
+async def handle_status(request: web.Request) -> web.Response:
+    """Expose queue depths and background job state for operators"""
+    if WEBHOOK_SECRET and request.headers.get("X-Ops-Token") != WEBHOOK_SECRET:
+        return web.json_response({"error": "forbidden"}, status=403)
+    
+    return web.json_response({
+        "mode": BOT_MODE,
+        "worker": WORKER_INDEX if BOT_MODE == "worker" else None,
+        "uptime": round(time.time() - process_started_at),
+        "users": len(user_ids),
+        "groups": len(group_ids),
+        "active_polls": len(poll_registry),
+        "auto_quiz": {"active_groups": len(auto_quiz_active_groups), "scheduled": len(auto_quiz_scheduler),
+                      "last_cycle": auto_quiz_last_cycle},
+        "queues": {"answers": answer_writer.queue_depth, "polls": poll_writer.queue_depth,
+                   "schedules": schedule_writer.queue_depth, "audits": audit_queue.qsize(),
+                   "outbound": outbound_scheduler.queue_depth, "opentdb": opentdb_limiter.queue_depth},
+        "leader": leader_election.is_leader,
+        "broadcasts": sorted(broadcast_engine.tasks),
+        "question_pools": {str(cat_id): len(pool) for cat_id, pool in question_pools.items()},
+        "db_pool": {"size": db_pool.get_size(), "idle": db_pool.get_idle_size()} if db_pool else None,
+    })
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """Serve metrics in the Prometheus text format"""
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Prometheus-Version": "0.0.4"})
+
+def build_web_app() -> web.Application:
+    """Create the aiohttp app serving health and ops routes, plus the webhook in webhook mode"""
+    app = web.Application()
+    app.router.add_get("/", handle_root)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/status", handle_status)
+    app.router.add_get("/metrics", handle_metrics)
+    
+    if BOT_MODE in ("webhook", "worker"):
+        path = WORKER_UPDATE_PATH if BOT_MODE == "worker" else WEBHOOK_PATH
+        SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=WEBHOOK_SECRET).register(app, path=path)
+        setup_application(app, dp, bot=bot)
+    return app
+
+async def on_webhook_startup():
+    """Point Telegram at this server"""
+    logger.info(f"🔗 Setting webhook to {WEBHOOK_URL}{WEBHOOK_PATH}")
+    await bot.set_webhook(
+        f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
 
-    def do_HEAD(self):
-        self.send_response(200)
-        self.end_headers()
+async def run_polling():
+    """Serve health and ops routes on this loop while long-polling Telegram"""
+    runner = web.AppRunner(build_web_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, WEB_HOST, WEB_PORT).start()
+    logger.info(f"🌐 Health server listening on port {WEB_PORT}")
+    
+    try:
+        await bot.delete_webhook()
+        logger.info("🚀 Starting bot polling - quiz bot is now live!")
+        await dp.start_polling(bot)
+    finally:
+        await runner.cleanup()
+
+# ─── Supervisor Mode: Chat-Affinity Worker Processes ────────────────────────
+WORKER_RESTART_DELAY = 2  # Seconds before a crashed worker is started again
+WORKER_STOP_TIMEOUT = 15  # Seconds a worker gets to flush its writers before it is killed
+
+# Update fields whose payload carries the chat the update belongs to
+CHAT_UPDATE_FIELDS = ("message", "edited_message", "channel_post", "edited_channel_post",
+                      "business_message", "edited_business_message", "message_reaction",
+                      "my_chat_member", "chat_member", "chat_join_request")
+
+def update_route_key(update: dict) -> str:
+    """Pick the affinity key of a raw update: its chat, else its poll, else its sender"""
+    for field in CHAT_UPDATE_FIELDS:
+        if field in update:
+            return f"chat:{update[field]['chat']['id']}"
+    
+    callback = update.get("callback_query")
+    if callback:
+        if callback.get("message"):
+            return f"chat:{callback['message']['chat']['id']}"
+        return f"user:{callback['from']['id']}"
+    
+    # Poll answers carry no chat; keying by poll keeps every answer to a poll on one worker
+    if "poll_answer" in update:
+        return f"poll:{update['poll_answer']['poll_id']}"
+    if "poll" in update:
+        return f"poll:{update['poll']['id']}"
+    
+    for payload in update.values():
+        if isinstance(payload, dict) and "from" in payload:
+            return f"user:{payload['from']['id']}"
+    return f"update:{update.get('update_id', 0)}"
+
+def route_worker(update: dict, count: int) -> int:
+    """Worker index owning an update; crc32 keeps the mapping stable across restarts"""
+    return zlib.crc32(update_route_key(update).encode()) % count
+
+def merge_worker_metrics(texts: List[Optional[str]]) -> str:
+    """Merge the Prometheus texts of all workers, adding a worker label to every sample"""
+    headers: Dict[str, List[str]] = {}  # metric name -> HELP and TYPE lines, in first-seen order
+    samples: Dict[str, List[str]] = {}
+    for index, text in enumerate(texts):
+        if not text:
+            continue
+        family = None
+        for line in text.splitlines():
+            if line.startswith(("# HELP ", "# TYPE ")):
+                family = line.split(" ", 3)[2]
+                if line not in headers.setdefault(family, []):
+                    headers[family].append(line)
+                samples.setdefault(family, [])
+            elif line and family is not None:
+                cut = min(i for i in (line.find("{"), line.find(" ")) if i >= 0)
+                if line[cut] == "{":
+                    separator = "" if line[cut + 1] == "}" else ","
+                    line = f'{line[:cut + 1]}worker="{index}"{separator}{line[cut + 1:]}'
+                else:
+                    line = f'{line[:cut]}{{worker="{index}"}}{line[cut:]}'
+                samples[family].append(line)
+    
+    lines = []
+    for family, family_headers in headers.items():
+        lines.extend(family_headers)
+        lines.extend(samples[family])
+    return "\n".join(lines) + "\n"
+
+class WorkerSupervisor:
+    """Run worker processes and forward each webhook update to the worker owning its chat"""
+    
+    def __init__(self, count: int, base_port: int):
+        self.count = count
+        self.base_port = base_port
+        self.processes: Dict[int, asyncio.subprocess.Process] = {}
+        self.tasks: List[asyncio.Task] = []
+        self.forwarded = [0] * count
+        self.restarts = 0
+        self.stopping = False
+        self.session: Optional[aiohttp.ClientSession] = None
+    
+    def worker_url(self, index: int, path: str = WORKER_UPDATE_PATH) -> str:
+        return f"http://127.0.0.1:{self.base_port + index}{path}"
+    
+    async def spawn(self, index: int) -> asyncio.subprocess.Process:
+        """Start worker `index` as a child running this script in worker mode"""
+        env = dict(os.environ, BOT_MODE="worker", WORKER_INDEX=str(index), WORKER_COUNT=str(self.count),
+                   PORT=str(self.base_port + index), WEB_HOST="127.0.0.1")
+        process = await asyncio.create_subprocess_exec(sys.executable, os.path.abspath(__file__), env=env)
+        self.processes[index] = process
+        logger.info(f"👷 Worker {index} started (pid {process.pid}, port {self.base_port + index})")
+        return process
+    
+    async def supervise(self, index: int):
+        """Keep worker `index` running until the supervisor stops"""
+        while not self.stopping:
+            try:
+                process = await self.spawn(index)
+                code = await process.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Could not start worker {index}: {str(e)}")
+                code = None
+            
+            if self.stopping:
+                break
+            self.restarts += 1
+            logger.error(f"❌ Worker {index} exited with code {code} - restarting in {WORKER_RESTART_DELAY}s")
+            await asyncio.sleep(WORKER_RESTART_DELAY)
+    
+    async def start(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0),
+            timeout=aiohttp.ClientTimeout(total=60),
+        )
+        self.tasks = [asyncio.create_task(self.supervise(index)) for index in range(self.count)]
+        logger.info(f"🧩 Supervising {self.count} workers on ports {self.base_port}-{self.base_port + self.count - 1}")
+    
+    async def stop(self):
+        """Ask every worker to shut down gracefully, killing those that do not exit in time"""
+        self.stopping = True
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        
+        running = [process for process in self.processes.values() if process.returncode is None]
+        for process in running:
+            process.terminate()
+        for process in running:
+            try:
+                await asyncio.wait_for(process.wait(), WORKER_STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning(f"⚠️ Worker pid {process.pid} did not stop in time - killing it")
+                process.kill()
+        
+        if self.session:
+            await self.session.close()
+        logger.info("🛑 All workers stopped")
+    
+    def worker_states(self) -> List[dict]:
+        return [
+            {"worker": index, "pid": process.pid if process else None,
+             "alive": bool(process and process.returncode is None), "forwarded": self.forwarded[index]}
+            for index, process in ((index, self.processes.get(index)) for index in range(self.count))
+        ]
+    
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """Forward a webhook update to its worker and relay the worker's reply"""
+        if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return web.Response(status=401)
+        
+        body = await request.read()
+        try:
+            index = route_worker(json.loads(body), self.count)
+        except (ValueError, KeyError, TypeError) as e:
+            # Acknowledge so Telegram does not keep redelivering an update no worker can take
+            logger.warning(f"⚠️ Dropping unroutable update: {str(e)}")
+            return web.Response(status=200)
+        
+        headers = {"Content-Type": "application/json"}
+        if WEBHOOK_SECRET:
+            headers["X-Telegram-Bot-Api-Secret-Token"] = WEBHOOK_SECRET
+        
+        try:
+            async with self.session.post(self.worker_url(index), data=body, headers=headers) as response:
+                reply = await response.read()
+                self.forwarded[index] += 1
+                return web.Response(status=response.status, body=reply, content_type=response.content_type)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Telegram redelivers on 5xx, so the update reaches the worker once it is back
+            logger.warning(f"⚠️ Worker {index} unavailable: {str(e)}")
+            return web.Response(status=503)
+    
+    async def fetch_worker(self, index: int, path: str, headers: Optional[dict] = None) -> Optional[str]:
+        """GET an ops route of one worker, returning None when the worker cannot answer"""
+        try:
+            async with self.session.get(self.worker_url(index, path), headers=headers,
+                                        timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status != 200:
+                    return None
+                return await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"⚠️ Worker {index} {path} unavailable: {str(e)}")
+            return None
+    
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        """Serve the metrics of every worker, labelled by worker"""
+        texts = await asyncio.gather(*(self.fetch_worker(index, "/metrics") for index in range(self.count)))
+        return web.Response(text=merge_worker_metrics(texts), content_type="text/plain", charset="utf-8",
+                            headers={"X-Prometheus-Version": "0.0.4"})
+    
+    async def handle_status(self, request: web.Request) -> web.Response:
+        """Collect the status of every worker next to the supervisor's own view of it"""
+        if WEBHOOK_SECRET and request.headers.get("X-Ops-Token") != WEBHOOK_SECRET:
+            return web.json_response({"error": "forbidden"}, status=403)
         
-    def log_message(self, format, *args):
-        # Override to suppress HTTP server logs
-        pass
+        headers = {"X-Ops-Token": WEBHOOK_SECRET} if WEBHOOK_SECRET else None
+        bodies = await asyncio.gather(*(self.fetch_worker(index, "/status", headers) for index in range(self.count)))
+        workers = self.worker_states()
+        for state, body in zip(workers, bodies):
+            state["status"] = json.loads(body) if body else None
+        return web.json_response({
+            "mode": BOT_MODE,
+            "uptime": round(time.time() - process_started_at),
+            "restarts": self.restarts,
+            "workers": workers,
+        })
+    
+    async def handle_health(self, request: web.Request) -> web.Response:
+        workers = self.worker_states()
+        healthy = all(state["alive"] for state in workers)
+        return web.json_response(
+            {"status": "ok" if healthy else "degraded", "mode": BOT_MODE, "restarts": self.restarts,
+             "uptime": round(time.time() - process_started_at), "workers": workers},
+            status=200 if healthy else 503
+        )
 
-def start_dummy_server():
-    port = int(os.environ.get("PORT", 10000))  # Render injects this
-    server = HTTPServer(("0.0.0.0", port), DummyHandler)
-    logger.info(f"🌐 Dummy server listening on port {port}")
-    server.serve_forever()
+worker_supervisor = WorkerSupervisor(WORKER_COUNT, WORKER_BASE_PORT)
 
-if __name__ == "__main__":
-    # Start dummy HTTP server (needed for Render health check)
-    threading.Thread(target=start_dummy_server, daemon=True).start()
+async def on_supervisor_startup(app: web.Application):
+    await worker_supervisor.start()
+    await on_webhook_startup()
 
+async def on_supervisor_cleanup(app: web.Application):
+    await worker_supervisor.stop()
+    await bot.session.close()
+
+def build_supervisor_app() -> web.Application:
+    """Create the public webhook front that spreads updates across worker processes"""
+    app = web.Application()
+    app.router.add_get("/", handle_root)
+    app.router.add_get("/health", worker_supervisor.handle_health)
+    app.router.add_get("/status", worker_supervisor.handle_status)
+    app.router.add_get("/metrics", worker_supervisor.handle_metrics)
+    app.router.add_post(WEBHOOK_PATH, worker_supervisor.handle_update)
+    app.on_startup.append(on_supervisor_startup)
+    app.on_cleanup.append(on_supervisor_cleanup)
+    return app
+
+if __name__ == "__main__":
     logger.info("🎯 Quiz Bot main execution started")
     try:
         loop = asyncio.get_running_loop()
@@ -1816,11 +4596,15 @@ if __name__ == "__main__":
     dp.shutdown.register(on_shutdown)
     dp.errors.register(global_error_handler)
 
-    async def main():
-        logger.info("🔁 Launching background auto quiz loop")
-        asyncio.create_task(auto_quiz_loop())
-        
-        logger.info("🚀 Starting bot polling - quiz bot is now live!")
-        await dp.start_polling(bot)
-
-    asyncio.run(main())
\ No newline at end of file
+    if BOT_MODE == "supervisor":
+        logger.info(f"🚀 Starting webhook front on port {WEB_PORT} for {WORKER_COUNT} workers")
+        web.run_app(build_supervisor_app(), host=WEB_HOST, port=WEB_PORT, access_log=None, print=None)
+    elif BOT_MODE == "worker":
+        logger.info(f"🚀 Starting worker {WORKER_INDEX} on port {WEB_PORT}")
+        web.run_app(build_web_app(), host=WEB_HOST, port=WEB_PORT, access_log=None, print=None)
+    elif BOT_MODE == "webhook":
+        dp.startup.register(on_webhook_startup)
+        logger.info(f"🚀 Starting webhook server on port {WEB_PORT} - quiz bot is now live!")
+        web.run_app(build_web_app(), host=WEB_HOST, port=WEB_PORT, access_log=None, print=None)
+    else:
+        asyncio.run(run_polling())
\ No newline at end of file